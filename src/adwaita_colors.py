@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
-from xml.etree.ElementTree import ElementTree, parse as parse_xml
+import functools
+import os
+from profiling import stage
 
 
+SCHEMES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gtksourceview_xml')
+
 # A dictionary of GtkSourceView style names mapped to TextMate scopes.
 # Use "Inspect Editor Tokens and Scopes" in VS Code to inspect TM scopes.
 # Use this link to figure out what matches a style name: https://gitlab.gnome.org/GNOME/gtksourceview/-/blob/master/data/language-specs/
@@ -281,60 +285,116 @@ MAP = {
 }
 
 
-def gsv_get_named_colors(scheme: ElementTree):
-    '''Get all colors from a GtkSourceView style scheme.'''
-    colors = {}
-    for color_elem in scheme.findall('color'):
-        colors[color_elem.get('name')] = color_elem.get('value')
-    return colors
+class Style:
+    '''A single <style> element of a GtkSourceView style scheme, with colors resolved.'''
+    __slots__ = ('name', 'foreground', 'background', 'bold', 'italic', 'strikethrough')
+
+    def __init__(self, name, foreground=None, background=None,
+                 bold=False, italic=False, strikethrough=False):
+        self.name = name
+        self.foreground = foreground
+        self.background = background
+        self.bold = bold
+        self.italic = italic
+        self.strikethrough = strikethrough
+
+
+class Scheme:
+    '''A parsed GtkSourceView style scheme: named colors and styles keyed by name.'''
+    __slots__ = ('path', 'named_colors', 'styles')
+
+    def __init__(self, path, named_colors, styles):
+        self.path = path
+        self.named_colors = named_colors
+        self.styles = styles
+
+    @classmethod
+    def from_tree(cls, tree, path=None):
+        named_colors = {}
+        for color_elem in tree.iterfind('color'):
+            named_colors[color_elem.get('name')] = color_elem.get('value')
+
+        def resolve(value):
+            # Styles may reference a named color or use a literal "#rrggbb".
+            if value is None or value.startswith('#'):
+                return value
+            return named_colors[value]
+
+        styles = {}
+        for style_elem in tree.iterfind('style'):
+            name = style_elem.get('name')
+            styles[name] = Style(
+                name,
+                foreground=resolve(style_elem.get('foreground')),
+                background=resolve(style_elem.get('background')),
+                bold=style_elem.get('bold') == 'true',
+                italic=style_elem.get('italic') == 'true',
+                strikethrough=style_elem.get('strikethrough') == 'true'
+            )
+
+        return cls(path, named_colors, styles)
+
+
+@functools.cache
+def load_scheme(path) -> Scheme:
+    '''Parse a GtkSourceView style scheme. Each file is parsed only once per process.'''
+    # Imported here rather than at the top, as it's slow to import and only needed once.
+    from xml.etree.ElementTree import parse as parse_xml
+    with stage('xml parse', path=path):
+        return Scheme.from_tree(parse_xml(path), path)
+
+
+def get_adwaita_scheme_path(theme_type):
+    if theme_type == 'dark':
+        return os.path.join(SCHEMES_DIR, 'Adwaita-dark.xml')
+    return os.path.join(SCHEMES_DIR, 'Adwaita.xml')
 
 
-def gsv_to_textmate(scheme: ElementTree):
-    '''Convert a GtkSourceView style scheme to a TextMate theme.'''
-    colors = gsv_get_named_colors(scheme)
+def get_adwaita_scheme(theme_type) -> Scheme:
+    return load_scheme(get_adwaita_scheme_path(theme_type))
 
-    default_elem = scheme.find('style[@name="text"]')
-    default_foreground = None
 
-    if default_elem is not None:
-        default_foreground = colors[default_elem.get('foreground')]
-    if default_foreground is None:
+def gsv_get_named_colors(scheme: Scheme):
+    '''Get all colors from a GtkSourceView style scheme.'''
+    return dict(scheme.named_colors)
+
+
+def gsv_to_textmate(scheme: Scheme, style_map=MAP):
+    '''Convert a GtkSourceView style scheme to a TextMate theme.'''
+    default_style = scheme.styles.get('text')
+    if default_style is None or default_style.foreground is None:
         raise Exception('no default color defined in scheme')
 
     rules = []
 
-    scope_paths = []
-    for style_name in MAP:
-        scope = MAP[style_name]
-        style_elem = scheme.find(f'style[@name="{style_name}"]')
+    for style_name, scope in style_map.items():
+        style = scheme.styles.get(style_name)
 
-        if style_elem is None:
+        if style is None:
             print(f'warning: no {style_name} in scheme')
             continue
 
         settings = {}
 
-        if style_elem.get('foreground'):
-            settings['foreground'] = colors[style_elem.get('foreground')]
+        if style.foreground:
+            settings['foreground'] = style.foreground
 
         font_styles = []
-        for font_style in 'italic', 'bold', 'strikethorugh':
-            if style_elem.get(font_style) == 'true':
+        for font_style in 'italic', 'bold', 'strikethrough':
+            if getattr(style, font_style):
                 font_styles.append(font_style)
         settings['fontStyle'] = ' '.join(font_styles)
 
-        rule = {'scope': scope, 'settings': settings}
+        rule = {'scope': list(scope), 'settings': settings}
         rules.append(rule)
 
     return rules
 
 
 def get_adwaita_colors(theme_type):
-    if theme_type == 'dark':
-        file = 'gtksourceview_xml/Adwaita-dark.xml'
-    else:
-        file = 'gtksourceview_xml/Adwaita.xml'
-    scheme = parse_xml(file)
-    named_colors = gsv_get_named_colors(scheme)
-    syntax_colors = gsv_to_textmate(scheme)
+    scheme = get_adwaita_scheme(theme_type)
+    with stage('gsv_get_named_colors', theme_type=theme_type):
+        named_colors = gsv_get_named_colors(scheme)
+    with stage('gsv_to_textmate', theme_type=theme_type):
+        syntax_colors = gsv_to_textmate(scheme)
     return named_colors, syntax_colors
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+'''Generate the color themes as dictionaries, without writing any files.
+
+    import adwaita_theme
+    theme = adwaita_theme.build_theme('dark', accent='teal')
+    themes = adwaita_theme.build_all()
+
+Nothing is parsed at import. Schemes and default themes are read from next to this module,
+regardless of the working directory, when they're first needed, and are cached after that.
+'''
+import copy
+import functools
+import os
+from adwaita_colors import get_adwaita_colors
+from adwaita_ui_colors import get_adwaita_ui_colors
+from jsonc import load_jsonc
+from profiling import stage
+from scopes import compact_token_colors
+from variants import AXES, Variant, get_variants
+
+
+DEFAULT_THEMES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'default_themes')
+
+
+def get_default_syntax_colors_path(theme_type):
+    return os.path.join(DEFAULT_THEMES_DIR, f'{theme_type}.jsonc')
+
+
+def get_default_syntax_colors(theme_type):
+    path = get_default_syntax_colors_path(theme_type)
+    with stage('jsonc load', path=path):
+        return load_jsonc(path)['tokenColors']
+
+
+extra_syntax_colors = [
+    {
+        'scope': ['markup.italic.markdown'],
+        'settings': {
+            'fontStyle': 'italic'
+        }
+    },
+    {
+        'scope': ['markup.strikethrough.markdown'],
+        'settings': {
+            'fontStyle': 'strikethrough'
+        }
+    }
+]
+
+
+def with_extra_syntax_colors(syntax_colors):
+    '''Add the rules that Adwaita syntax highlighting needs besides those of the scheme.'''
+    return syntax_colors + extra_syntax_colors
+
+
+def get_syntax_colors(theme_type, syntax):
+    if syntax == 'adwaita':
+        _named_colors, syntax_colors = get_adwaita_colors(theme_type)
+        return with_extra_syntax_colors(syntax_colors)
+    return get_default_syntax_colors(theme_type)
+
+
+@functools.cache
+def get_token_colors(theme_type, syntax):
+    '''Get the compacted tokenColors of a theme. The result is shared, so don't modify it.'''
+    return compact_token_colors(get_syntax_colors(theme_type, syntax))
+
+
+def get_theme(variant, ui_colors, token_colors):
+    return {
+        '$schema': 'vscode://schemas/color-theme',
+        'name': variant.name,
+        'type': 'light',
+        'colors': ui_colors,
+        'tokenColors': token_colors
+    }
+
+
+def build_theme(theme_type='dark', syntax='adwaita', colorful_status_bar=False, accent='blue'):
+    '''Get the color theme for a variant, exactly as `build.py` would write it.'''
+    params = {
+        'theme_type': theme_type,
+        'accent': accent,
+        'syntax': syntax,
+        'colorful_status_bar': colorful_status_bar
+    }
+    for axis in AXES:
+        if params[axis.name] not in axis.values:
+            raise ValueError(f'invalid {axis.name}: {params[axis.name]!r}')
+
+    return get_theme(
+        Variant(params),
+        get_adwaita_ui_colors(theme_type, colorful_status_bar, accent),
+        copy.deepcopy(get_token_colors(theme_type, syntax))
+    )
+
+
+def build_all(accents=('blue',)):
+    '''Get the color themes of all variants with the given accents, keyed by file name.'''
+    return {
+        variant.file_name: build_theme(**variant.params)
+        for variant in get_variants(selected={'accent': accents})
+    }
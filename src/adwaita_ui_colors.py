@@ -1,11 +1,81 @@
-from adwaita_colors import get_adwaita_colors
+import functools
+from adwaita_colors import get_adwaita_scheme
+from color_math import transfer_shades, with_alpha
+from jsonc import load_jsonc
+from nearest_colors import snap_colors
+
+
+# libadwaita accent colors: https://gnome.pages.gitlab.gnome.org/libadwaita/doc/main/enum.AccentColor.html
+ACCENT_COLORS = {
+    'blue':     '#3584e4',
+    'teal':     '#2190a4',
+    'green':    '#3a944a',
+    'yellow':   '#c88800',
+    'orange':   '#ed5b00',
+    'red':      '#e62d42',
+    'pink':     '#d56199',
+    'purple':   '#9141ac',
+    'slate':    '#6f8396',
+}
+
+
+def get_named_colors():
+    # Both variants share the palette from the light scheme.
+    return get_adwaita_scheme('light').named_colors
+
+
+def derive_accent_shades(accent, named_colors):
+    '''Get the shades used for an accent color, keyed like the blue ones they're derived from.'''
+    blue_shades = {value: named_colors[f'blue_{value}'] for value in range(1, 8)}
+    # Color-picked from the blue accent.
+    blue_shades['hover'] = '#4990e7'
+    blue_shades['focus'] = '#5f7999'
+    # The blue accent is the scheme's own blue, whatever ACCENT_COLORS says it is.
+    if accent == 'blue':
+        return blue_shades
+
+    shades = transfer_shades(ACCENT_COLORS[accent], blue_shades[3], list(blue_shades.values()))
+    return dict(zip(blue_shades, shades))
+
+
+@functools.cache
+def get_accent_shades(accent):
+    return derive_accent_shades(accent, get_named_colors())
+
+
+@functools.cache
+def get_default_ui_colors(theme_type):
+    '''Get the workbench colors that VS Code's default theme sets.
+
+    Colors that are commented out there are left out: VS Code derives many of them from other
+    colors, like `activityBar.inactiveForeground` from `activityBar.foreground`, so pinning
+    them would stop them from following the hand-picked colors.
+    '''
+    # Imported here, as adwaita_theme imports this module.
+    from adwaita_theme import get_default_syntax_colors_path
+    return {
+        key: color
+        for key, color in load_jsonc(get_default_syntax_colors_path(theme_type))['colors'].items()
+        if isinstance(color, str) and color.startswith('#')
+    }
+
 
+@functools.cache
+def derive_ui_colors(theme_type, palette):
+    '''Get the colors of the default theme, each snapped to the nearest color of `palette`.'''
+    return snap_colors(get_default_ui_colors(theme_type), palette)
 
-named_colors, _syntax_colors = get_adwaita_colors('light')
 
+def get_adwaita_ui_colors(theme_type, colorful_status_bar=False, accent='blue', named_colors=None):
+    '''Get the UI colors of a variant, optionally from another palette of named colors.'''
+    if named_colors is None:
+        named_colors = get_named_colors()
+        accent_shades = get_accent_shades(accent)
+    else:
+        accent_shades = derive_accent_shades(accent, named_colors)
 
-def get_adwaita_ui_colors(theme_type, colorful_status_bar=False):
     def _(name): return lambda value: named_colors[f'{name}_{value}']
+    def _accent(value): return accent_shades[value]
     dark = theme_type == 'dark'
 
     ui_colors = {
@@ -54,6 +124,8 @@ def get_adwaita_ui_colors(theme_type, colorful_status_bar=False):
         'list.hoverBackground':                 '#333333' if dark else '#ececec',
         'list.inactiveSelectionBackground':     '#3a3a3a' if dark else '#e6e6e6',
         'input.background':                     '#3a3a3a' if dark else '#e6e6e6',
+        # The default theme's placeholder is too faint on the input background above.
+        'input.placeholderForeground':          '#ccccccc0' if dark else '#323232c0',
 
         # #323232 is from libadwaita. For dark theme most text is #fff, but in VS Code there's way
         # more text displayed at the same time, so I find a softer color works better.
@@ -66,11 +138,11 @@ def get_adwaita_ui_colors(theme_type, colorful_status_bar=False):
         'panelTitle.activeForeground':          '#cccccc' if dark else '#323232',
 
         'activityBar.activeBorder':             '#00000000',
-        'activityBarBadge.background':          _('blue')(3),
-        'button.background':                    _('blue')(3),
+        'activityBarBadge.background':          _accent(3),
+        'button.background':                    _accent(3),
         # A border of the same color makes buttons slightly taller.
-        'button.border':                        _('blue')(3),
-        'list.activeSelectionBackground':       _('blue')(6 if dark else 4),
+        'button.border':                        _accent(3),
+        'list.activeSelectionBackground':       _accent(6 if dark else 4),
         'list.highlightForeground':             '#ffffff' if dark else '#000000',
         'list.activeSelectionForeground':       '#ffffff',
         'list.activeSelectionIconForeground':   '#ffffff',
@@ -79,21 +151,21 @@ def get_adwaita_ui_colors(theme_type, colorful_status_bar=False):
 
         'editorGutter.addedBackground':                     _('green')(6 if dark else 3),
         'editorGutter.deletedBackground':                   _('red')(5 if dark else 4),
-        'editorGutter.modifiedBackground':                  _('blue')(5 if dark else 2),
-        'gitDecoration.addedResourceForeground':            _('green')(1 if dark else 5) + 'dd',
-        'gitDecoration.renamedResourceForeground':          _('green')(1 if dark else 5) + 'dd',
-        'gitDecoration.untrackedResourceForeground':        _('green')(1 if dark else 5) + 'dd',
-        'gitDecoration.modifiedResourceForeground':         _('orange')(1 if dark else 4) + 'dd',
-        'gitDecoration.stageModifiedResourceForeground':    _('orange')(1 if dark else 4) + 'dd',
-        'gitDecoration.deletedResourceForeground':          _('red')(1) + 'dd',
-        'gitDecoration.stageDeletedResourceForeground':     _('red')(1) + 'dd',
+        'editorGutter.modifiedBackground':                  _accent(5 if dark else 2),
+        'gitDecoration.addedResourceForeground':            with_alpha(_('green')(1 if dark else 5), 0xdd),
+        'gitDecoration.renamedResourceForeground':          with_alpha(_('green')(1 if dark else 5), 0xdd),
+        'gitDecoration.untrackedResourceForeground':        with_alpha(_('green')(1 if dark else 5), 0xdd),
+        'gitDecoration.modifiedResourceForeground':         with_alpha(_('orange')(1 if dark else 4), 0xdd),
+        'gitDecoration.stageModifiedResourceForeground':    with_alpha(_('orange')(1 if dark else 4), 0xdd),
+        'gitDecoration.deletedResourceForeground':          with_alpha(_('red')(1), 0xdd),
+        'gitDecoration.stageDeletedResourceForeground':     with_alpha(_('red')(1), 0xdd),
         'gitDecoration.ignoredResourceForeground':          _('dark')(1),
 
         # Color-picked colors
         'commandCenter.background':             '#444444' if dark else '#d9d9d9',
         'commandCenter.border':                 '#00000000',
-        'button.hoverBackground':               '#4990e7',
-        'focusBorder':                          '#5f7999',
+        'button.hoverBackground':               _accent('hover'),
+        'focusBorder':                          _accent('focus'),
 
         # Hand-picked colors
         'activityBar.foreground':               '#ffffff' if dark else '#000000',
@@ -104,7 +176,7 @@ def get_adwaita_ui_colors(theme_type, colorful_status_bar=False):
 
     if colorful_status_bar:
         ui_colors |= {
-            'statusBar.background':             _('blue')(4),
+            'statusBar.background':             _accent(4),
             'statusBar.debuggingBackground':    _('orange')(5),
             'statusBar.noFolderBackground':     _('purple')(5),
             'statusBarItem.remoteBackground':   _('green')(6),
@@ -114,4 +186,13 @@ def get_adwaita_ui_colors(theme_type, colorful_status_bar=False):
             'statusBarItem.remoteForeground':   '#ffffff',
         }
 
-    return ui_colors
+    # The other colors VS Code's default theme sets are snapped to the nearest of the colors above,
+    # the named colors and the accent shades. The neutral greys picked above are libadwaita's,
+    # unlike the warmer dark_ and light_ named colors. The palette is lowercase "#rrggbb", like
+    # the colors picked above and the alpha `with_alpha` adds.
+    palette = tuple(sorted({
+        color[:7].lower()
+        for color in [*named_colors.values(), *accent_shades.values(), *ui_colors.values()]
+        if len(color) == 7 or color[7:].lower() == 'ff'
+    }))
+    return derive_ui_colors(theme_type, palette) | ui_colors
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+'''Check the WCAG contrast of foreground/background pairs in every theme variant.
+
+Translucent colors are composited over the backgrounds they're actually drawn on before
+contrast ratios are computed. All pairs of all variants are checked in one batch.
+'''
+import argparse
+import json
+import re
+import sys
+from adwaita_theme import get_token_colors
+from adwaita_ui_colors import ACCENT_COLORS, get_adwaita_ui_colors
+from color_math import composite, contrast_ratios, parse_hex
+from variants import get_variants
+
+
+# Kinds of pairs, and their WCAG AA minimum contrast ratios.
+TEXT = 'text'
+NON_TEXT = 'non-text'
+MINIMUM_RATIOS = {TEXT: 4.5, NON_TEXT: 3.0}
+
+# VS Code's defaults for colors that the themes don't set but that are checked below.
+DEFAULT_COLORS = {
+    'button.foreground':                '#ffffff',
+    'activityBarBadge.foreground':      '#ffffff',
+    'statusBar.debuggingBackground':    '#cc6633',
+}
+
+# (foreground, backgrounds from top to bottom, kind). Backgrounds are composited until
+# an opaque one is reached. Other pairs are found by the names of their keys, see `get_pairs`.
+UI_PAIRS = [
+    ('sideBar.foreground',                  ['sideBar.background'], TEXT),
+    ('panelTitle.activeForeground',         ['panel.background'], TEXT),
+    ('statusBar.foreground',                ['statusBar.background'], TEXT),
+    ('statusBar.noFolderForeground',        ['statusBar.noFolderBackground'], TEXT),
+    ('statusBar.debuggingForeground',       ['statusBar.debuggingBackground'], TEXT),
+    ('statusBarItem.remoteForeground',      ['statusBarItem.remoteBackground'], TEXT),
+    ('list.activeSelectionForeground',      ['list.activeSelectionBackground',
+                                             'sideBar.background'], TEXT),
+    ('button.foreground',                   ['button.background'], TEXT),
+    ('activityBarBadge.foreground',         ['activityBarBadge.background'], TEXT),
+    ('activityBar.foreground',              ['activityBar.background'], NON_TEXT),
+    ('editorLineNumber.foreground',         ['editor.background'], NON_TEXT),
+    ('editorGutter.addedBackground',        ['editor.background'], NON_TEXT),
+    ('editorGutter.modifiedBackground',     ['editor.background'], NON_TEXT),
+    ('editorGutter.deletedBackground',      ['editor.background'], NON_TEXT),
+    ('gitDecoration.addedResourceForeground',       ['sideBar.background'], TEXT),
+    ('gitDecoration.modifiedResourceForeground',    ['sideBar.background'], TEXT),
+    ('gitDecoration.deletedResourceForeground',     ['sideBar.background'], TEXT),
+    ('gitDecoration.untrackedResourceForeground',   ['sideBar.background'], TEXT),
+    ('gitDecoration.ignoredResourceForeground',     ['sideBar.background'], NON_TEXT),
+]
+
+
+# A foreground key, like "tab.activeForeground" or "menu.foreground".
+_FOREGROUND_KEY = re.compile(r'(?P<section>[^.]+)\.(?P<name>.*?)(?P<f>[Ff])oreground')
+
+
+def get_pairs(ui_colors):
+    '''Get the pairs of UI_PAIRS, and of every other foreground with a background to match.
+
+    A foreground like "tab.activeForeground" is checked on "tab.activeBackground", or else on
+    the background of its section, "tab.background". Icon colors are checked as non-text.
+    '''
+    pairs = list(UI_PAIRS)
+    listed = {foreground for foreground, _backgrounds, _kind in UI_PAIRS}
+    for key in ui_colors:
+        match = _FOREGROUND_KEY.fullmatch(key)
+        if match is None or key in listed:
+            continue
+        section, name = match['section'], match['name']
+        for background in (f'{section}.{name}{"B" if match["f"] == "F" else "b"}ackground',
+                           f'{section}.background'):
+            if background in ui_colors:
+                kind = NON_TEXT if 'icon' in key.lower() else TEXT
+                pairs.append((key, [background], kind))
+                break
+    return pairs
+
+
+def get_checks(ui_colors, token_colors):
+    '''Get (foreground, [backgrounds], kind) for a variant, along with colors by name.'''
+    colors = DEFAULT_COLORS | ui_colors
+    checks = []
+    for foreground, backgrounds, kind in get_pairs(colors):
+        if foreground in colors and all(background in colors for background in backgrounds):
+            checks.append((foreground, backgrounds, kind))
+
+    for rule in token_colors:
+        foreground = rule['settings'].get('foreground')
+        if foreground:
+            scope = ', '.join(rule['scope'])
+            colors[f'tokenColors: {scope}'] = foreground
+            checks.append((f'tokenColors: {scope}', ['editor.background'], TEXT))
+    return colors, checks
+
+
+def audit(variants, minimum_ratios=MINIMUM_RATIOS):
+    '''Get a report of contrast checks for (variant, ui_colors, token_colors) tuples.'''
+    rows = []
+    foregrounds = []
+    backgrounds = []
+    for variant, ui_colors, token_colors in variants:
+        colors, checks = get_checks(ui_colors, token_colors)
+        for foreground, background_names, kind in checks:
+            layers = [parse_hex(colors[name]) for name in background_names]
+            # Anything still translucent at the bottom is drawn over the window background.
+            if layers[-1][3] < 1:
+                layers.append(parse_hex(colors['editor.background']))
+            background = composite(layers)
+            foregrounds.append(composite([parse_hex(colors[foreground]), (*background, 1)]))
+            backgrounds.append(background)
+            rows.append((variant.file_name, foreground, background_names, minimum_ratios[kind]))
+
+    report = {}
+    failures = 0
+    for (file_name, foreground, background_names, minimum), ratio in zip(
+        rows, contrast_ratios(foregrounds, backgrounds)
+    ):
+        passed = ratio >= minimum
+        failures += not passed
+        report.setdefault(file_name, []).append({
+            'foreground': foreground,
+            'background': background_names,
+            'ratio': round(ratio, 2),
+            'minimum': minimum,
+            'pass': passed
+        })
+    return report, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check contrast ratios in all theme variants.')
+    parser.add_argument('--accents', nargs='+', choices=[*ACCENT_COLORS, 'all'], default=['all'],
+                        help='accent colors to check (default: all)')
+    parser.add_argument('--text-minimum', type=float, default=MINIMUM_RATIOS[TEXT],
+                        help=f'minimum contrast ratio for text (default: {MINIMUM_RATIOS[TEXT]})')
+    parser.add_argument('--non-text-minimum', type=float, default=MINIMUM_RATIOS[NON_TEXT],
+                        help='minimum contrast ratio for icons, gutter markers etc. '
+                             f'(default: {MINIMUM_RATIOS[NON_TEXT]})')
+    parser.add_argument('--json', action='store_true', help='print the full report as JSON')
+    parser.add_argument('--fail', action='store_true',
+                        help='exit with an error if any pair is below its minimum ratio')
+    args = parser.parse_args()
+    accents = tuple(ACCENT_COLORS) if 'all' in args.accents else args.accents
+
+    variants = []
+    for variant in get_variants(selected={'accent': accents}):
+        params = variant.params
+        ui_colors = get_adwaita_ui_colors(
+            params['theme_type'], params['colorful_status_bar'], params['accent']
+        )
+        token_colors = get_token_colors(params['theme_type'], params['syntax'])
+        variants.append((variant, ui_colors, token_colors))
+
+    report, failures = audit(variants, {TEXT: args.text_minimum, NON_TEXT: args.non_text_minimum})
+
+    if args.json:
+        print(json.dumps({'failures': failures, 'variants': report}, indent=2))
+    else:
+        for file_name, checks in report.items():
+            failed = [check for check in checks if not check['pass']]
+            print(f'{file_name}: {len(checks) - len(failed)}/{len(checks)} passed')
+            for check in failed:
+                print(f'  {check["ratio"]:5.2f} < {check["minimum"]}  {check["foreground"]} '
+                      f'on {" over ".join(check["background"])}')
+        print(f'\n{failures} check(s) below the minimum contrast ratio.')
+
+    if args.fail and failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
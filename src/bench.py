@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+'''Benchmark the theme generator, per function and end to end.
+
+Besides the real inputs, functions are timed on synthetic inputs scaled far beyond them: a
+scheme with thousands of styles, a MAP with thousands of selectors, multi-megabyte JSONC and
+thousands of colors to snap to the palette. Synthetic inputs are generated deterministically,
+so runs with the same options are comparable.
+
+Save results with `--save baseline.json` and compare a later run against them with
+`--compare baseline.json`, which exits with an error if anything got slower or bigger than
+the threshold allows.
+'''
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from adwaita_colors import get_adwaita_scheme_path, gsv_to_textmate, load_scheme
+from adwaita_theme import get_default_syntax_colors_path
+from adwaita_ui_colors import (
+    derive_ui_colors, get_accent_shades, get_adwaita_ui_colors, get_named_colors
+)
+from jsonc import load_jsonc
+from nearest_colors import snap_colors
+from scopes import compact_token_colors
+
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_jsonc_regex(path):
+    '''The regex-based loader that `jsonc.load_jsonc` replaced, kept as a reference.'''
+    original = open(path).read()
+    stripped = re.sub(r'[^:]//.+$', '', original, flags=re.MULTILINE)
+    return json.loads(stripped)
+
+
+def time_function(function, repeat=5):
+    '''Get the best and median time of a call, in seconds, from `repeat` runs.
+
+    Fast functions are called several times per run, so that each run takes at least 0.2 s.
+    '''
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    times = [time / number for time in timer.repeat(repeat, number)]
+    return min(times), statistics.median(times)
+
+
+def write_large_jsonc(path, size):
+    '''Write a JSONC array of copies of a default theme that's at least `size` bytes long.'''
+    theme = open(get_default_syntax_colors_path('dark')).read()
+    copies = size // len(theme.encode()) + 1
+    with open(path, 'w') as f:
+        f.write('[\n' + ',\n'.join([theme] * copies) + '\n]\n')
+
+
+def write_synthetic_scheme(path, styles):
+    '''Write a style scheme with `styles` named colors and styles, plus "text".'''
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<style-scheme id="synthetic" _name="Synthetic" version="1.0">'
+    ]
+    for index in range(styles):
+        lines.append(f'  <color name="color_{index}" value="#{index * 2654435761 % 0xffffff:06x}"/>')
+    lines.append('  <style name="text" foreground="color_0"/>')
+    for index in range(styles):
+        bold = 'true' if index % 3 == 0 else 'false'
+        italic = 'true' if index % 5 == 0 else 'false'
+        lines.append(f'  <style name="synthetic:style-{index}" foreground="color_{index}" '
+                     f'bold="{bold}" italic="{italic}"/>')
+    lines.append('</style-scheme>')
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def get_synthetic_map(styles, selectors):
+    '''Get a MAP for a synthetic scheme with `selectors` selectors spread over its styles.
+
+    Every fourth selector has a parent scope, like the language-specific ones in MAP.
+    '''
+    style_map = {'text': ['']}
+    for index in range(selectors):
+        scope = f'entity.synthetic.scope-{index}.lang-{index % 50}'
+        if index % 4 == 0:
+            scope = f'source.lang-{index % 50} {scope}'
+        style_map.setdefault(f'synthetic:style-{index % styles}', []).append(scope)
+    return style_map
+
+
+def copy_project(tmp_dir):
+    '''Copy the generator to `tmp_dir`, so it can be run without touching this checkout.'''
+    src_dir = os.path.join(tmp_dir, 'src')
+    shutil.copytree(SRC_DIR, src_dir, ignore=shutil.ignore_patterns(
+        '__pycache__', '.build-manifest.json', '.grammar-index.json', '.glyph-cache.json',
+        '.ir-cache.pickle', 'build-profile.*'
+    ))
+    os.mkdir(os.path.join(tmp_dir, 'themes'))
+    return src_dir
+
+
+def run_build(src_dir, *args):
+    subprocess.run([sys.executable, 'build.py', '--force', *args], cwd=src_dir,
+                   stdout=subprocess.DEVNULL, check=True)
+
+
+def get_output_size(src_dir):
+    themes_dir = os.path.join(src_dir, '..', 'themes')
+    return sum(entry.stat().st_size for entry in os.scandir(themes_dir))
+
+
+def get_benchmarks(args, tmp_dir):
+    '''Get (name, setup) pairs. Each setup prepares inputs and returns the function to time.'''
+    benchmarks = []
+
+    def add(name):
+        def decorator(setup):
+            benchmarks.append((name, setup))
+            return setup
+        return decorator
+
+    for theme_type in 'dark', 'light':
+        path = get_default_syntax_colors_path(theme_type)
+
+        @add(f'load_jsonc[default_themes/{theme_type}.jsonc]')
+        def _(path=path):
+            return lambda: load_jsonc(path)
+
+    for size_mb in args.sizes:
+        for name, function in ('load_jsonc', load_jsonc), ('load_jsonc_regex', load_jsonc_regex):
+            @add(f'{name}[synthetic {size_mb:g} MiB]')
+            def _(size_mb=size_mb, function=function):
+                path = os.path.join(tmp_dir, f'large-{size_mb:g}.jsonc')
+                if not os.path.exists(path):
+                    write_large_jsonc(path, int(size_mb * 1024 * 1024))
+                    if load_jsonc(path) != load_jsonc_regex(path):
+                        raise Exception('load_jsonc and the reference implementation disagree')
+                return lambda: function(path)
+
+    for theme_type in 'dark', 'light':
+        path = get_adwaita_scheme_path(theme_type)
+
+        @add(f'load_scheme[gtksourceview_xml/{os.path.basename(path)}]')
+        def _(path=path):
+            # Bypass the cache, so that the file is actually parsed every time.
+            return lambda: load_scheme.__wrapped__(path)
+
+        @add(f'gsv_to_textmate[{theme_type}]')
+        def _(path=path):
+            scheme = load_scheme(path)
+            return lambda: gsv_to_textmate(scheme)
+
+    synthetic_name = f'synthetic {args.styles} styles, {args.selectors} selectors'
+    synthetic_path = os.path.join(tmp_dir, 'synthetic.xml')
+
+    @add(f'load_scheme[{synthetic_name}]')
+    def _():
+        write_synthetic_scheme(synthetic_path, args.styles)
+        return lambda: load_scheme.__wrapped__(synthetic_path)
+
+    @add(f'gsv_to_textmate[{synthetic_name}]')
+    def _():
+        write_synthetic_scheme(synthetic_path, args.styles)
+        scheme = load_scheme.__wrapped__(synthetic_path)
+        style_map = get_synthetic_map(args.styles, args.selectors)
+        return lambda: gsv_to_textmate(scheme, style_map)
+
+    @add(f'compact_token_colors[{synthetic_name}]')
+    def _():
+        write_synthetic_scheme(synthetic_path, args.styles)
+        scheme = load_scheme.__wrapped__(synthetic_path)
+        token_colors = gsv_to_textmate(scheme, get_synthetic_map(args.styles, args.selectors))
+        return lambda: compact_token_colors(token_colors)
+
+    @add('get_adwaita_ui_colors[dark, blue]')
+    def _():
+        return lambda: get_adwaita_ui_colors('dark', False, 'blue')
+
+    @add('get_adwaita_ui_colors[dark, teal, uncached shades]')
+    def _():
+        def function():
+            get_accent_shades.cache_clear()
+            get_adwaita_ui_colors('dark', False, 'teal')
+        return function
+
+    @add('get_adwaita_ui_colors[dark, teal, uncached derived colors]')
+    def _():
+        def function():
+            derive_ui_colors.cache_clear()
+            get_adwaita_ui_colors('dark', False, 'teal')
+        return function
+
+    @add(f'snap_colors[synthetic {args.colors} colors]')
+    def _():
+        generator = random.Random(0)
+        colors = {
+            f'synthetic.color{index}': f'#{generator.getrandbits(32):08x}'
+            for index in range(args.colors)
+        }
+        palette = sorted(set(get_named_colors().values()))
+        return lambda: snap_colors(colors, palette)
+
+    for name, build_args in ('build.py --force -j 1', ['-j', '1']), \
+                            ('build.py --force --accents all', ['--accents', 'all']):
+        @add(name)
+        def _(build_args=build_args):
+            src_dir = copy_project(tempfile.mkdtemp(dir=tmp_dir))
+            return lambda: run_build(src_dir, *build_args)
+
+    return benchmarks
+
+
+# Builds whose total output size is measured, in bytes.
+SIZE_BUILDS = (
+    ('themes[blue]', []),
+    ('themes[all accents]', ['--accents', 'all'])
+)
+
+
+def get_sizes(tmp_dir, name_filter=''):
+    sizes = {}
+    for name, build_args in SIZE_BUILDS:
+        if name_filter not in name:
+            continue
+        src_dir = copy_project(tempfile.mkdtemp(dir=tmp_dir))
+        run_build(src_dir, *build_args)
+        sizes[name] = get_output_size(src_dir)
+    return sizes
+
+
+def compare(results, baseline, threshold):
+    '''Print the changes against a baseline. Returns the names of regressions.'''
+    regressions = []
+    print(f'\n{"":<64} {"baseline":>12} {"now":>12} {"change":>8}')
+    # Times are compared by the best run, which is the least noisy.
+    for kind, key, unit in ('times', 'best_ms', 'ms'), ('sizes', None, 'B'):
+        for name, result in results[kind].items():
+            value = result[key] if key else result
+            previous = baseline.get(kind, {}).get(name)
+            if previous is None:
+                print(f'{name:<64} {"-":>12} {value:>9.3f} {unit:<2} {"new":>8}')
+                continue
+            previous = previous[key] if key else previous
+            change = value / previous - 1 if previous else 0
+            regressed = change > threshold
+            if regressed:
+                regressions.append(name)
+            print(f'{name:<64} {previous:>9.3f} {unit:<2} {value:>9.3f} {unit:<2} '
+                  f'{change:>+8.1%}{"  REGRESSION" if regressed else ""}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the theme generator.')
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1, 4, 16],
+                        help='sizes of the synthetic JSONC inputs, in MiB (default: 1 4 16)')
+    parser.add_argument('--styles', type=int, default=5000,
+                        help='number of styles in the synthetic scheme (default: 5000)')
+    parser.add_argument('--selectors', type=int, default=20000,
+                        help='number of selectors in the synthetic MAP (default: 20000)')
+    parser.add_argument('--colors', type=int, default=10000,
+                        help='number of distinct colors to snap to the palette (default: 10000)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of runs to take the best and median time of (default: 5)')
+    parser.add_argument('-k', '--filter', default='',
+                        help='only run benchmarks whose name contains this')
+    parser.add_argument('--save', metavar='PATH', help='save the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='compare the results to a baseline saved with --save')
+    parser.add_argument('--threshold', type=float, default=10,
+                        help='slowdown or growth that counts as a regression, in percent '
+                             '(default: 10)')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': {
+            'sizes': args.sizes,
+            'styles': args.styles,
+            'selectors': args.selectors,
+            'colors': args.colors,
+            'repeat': args.repeat
+        },
+        'times': {},
+        'sizes': {}
+    }
+    if baseline is not None and baseline.get('options') != results['options']:
+        print('warning: the baseline was recorded with different options')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, setup in get_benchmarks(args, tmp_dir):
+            if args.filter not in name:
+                continue
+            best, median = time_function(setup(), args.repeat)
+            results['times'][name] = {'best_ms': best * 1000, 'median_ms': median * 1000}
+            print(f'{name:<64} best {best * 1000:10.3f} ms, median {median * 1000:10.3f} ms')
+
+        results['sizes'] = get_sizes(tmp_dir, args.filter)
+        for name, size in results['sizes'].items():
+            print(f'{name:<64} {size / 1024:10.1f} KiB')
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold / 100)
+        if regressions:
+            print(f'\n{len(regressions)} regression(s) beyond {args.threshold:g}%.')
+            sys.exit(1)
+        print('\nNo regressions.')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,81 +1,283 @@
 #!/usr/bin/env python3
+import argparse
+import functools
+import hashlib
 import json
-import re
-import itertools
-from adwaita_colors import get_adwaita_colors
-from adwaita_ui_colors import get_adwaita_ui_colors
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from adwaita_colors import MAP, get_adwaita_scheme_path
+from adwaita_theme import (
+    extra_syntax_colors, get_default_syntax_colors_path, get_syntax_colors, get_theme
+)
+from adwaita_ui_colors import ACCENT_COLORS, get_adwaita_ui_colors
+from profiling import Profiler, stage
+from scopes import compact_token_colors
+from variants import get_variants
 
 
-def load_jsonc(path):
-    '''Read JSON with comments.'''
-    original = open(path).read()
-    stripped = re.sub(r'[^:]//.+$', '', original, flags=re.MULTILINE)
-    return json.loads(stripped)
+# Bump this whenever a change to the generator itself changes its output,
+# so that cached themes from older runs get rebuilt.
+GENERATOR_VERSION = 4
 
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+THEMES_DIR = os.path.join(SRC_DIR, '..', 'themes')
 
-def get_default_syntax_colors(theme_type):
-    return load_jsonc(f'default_themes/{theme_type}.jsonc')['tokenColors']
+# Records the hashes of the inputs each theme was last built from.
+MANIFEST_PATH = os.path.join(SRC_DIR, '.build-manifest.json')
 
 
-extra_syntax_colors = [
-    {
-        'scope': ['markup.italic.markdown'],
-        'settings': {
-            'fontStyle': 'italic'
-        }
-    },
-    {
-        'scope': ['markup.strikethrough.markdown'],
-        'settings': {
-            'fontStyle': 'strikethrough'
-        }
-    }
-]
+def hash_json(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+@functools.cache
+def hash_file(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
 
-package_json_entry = {
-    'contributes': {
-        'themes': []
+def get_variant_inputs(theme_type, syntax, ui_colors):
+    '''Get hashes of everything a theme variant is generated from.'''
+    inputs = {
+        'generator': GENERATOR_VERSION,
+        'ui_colors': hash_json(ui_colors)
     }
-}
-
-for (
-    theme_type,
-    syntax_colors_type,
-    colorful_status_bar
-) in itertools.product(
-    ('dark', 'light'),
-    ('adwaita', 'default'),
-    (False, True)
-):
-    name = f'Adwaita {theme_type.capitalize()}'
-    ui_colors = get_adwaita_ui_colors(theme_type, colorful_status_bar)
-
-    if syntax_colors_type == 'adwaita':
-        _named_colors, syntax_colors = get_adwaita_colors(theme_type)
-        syntax_colors += extra_syntax_colors
+    if syntax == 'adwaita':
+        inputs['scheme'] = hash_file(get_adwaita_scheme_path(theme_type))
+        inputs['map'] = hash_json(MAP)
+        inputs['extra_syntax_colors'] = hash_json(extra_syntax_colors)
     else:
-        syntax_colors = get_default_syntax_colors(theme_type)
-        name += ' & default syntax highlighting'
-
-    if colorful_status_bar:
-        name += ' & colorful status bar'
-
-    theme = {
-        '$schema': 'vscode://schemas/color-theme',
-        'name': name,
-        'type': 'light',
-        'colors': ui_colors,
-        'tokenColors': syntax_colors
+        inputs['jsonc'] = hash_file(get_default_syntax_colors_path(theme_type))
+    return inputs
+
+
+def write_if_changed(path, content):
+    '''Atomically replace the file at `path` with `content`, unless it's already identical.
+
+    `content` is either text or bytes. Returns whether the file was written.
+    '''
+    data = content.encode() if isinstance(content, str) else content
+    mode = 0o644
+    try:
+        with open(path, 'rb') as f:
+            if hashlib.sha256(f.read()).digest() == hashlib.sha256(data).digest():
+                return False
+            mode = os.stat(f.fileno()).st_mode & 0o777
+    except FileNotFoundError:
+        pass
+
+    # Write to a temporary file in the same directory and rename it over the target, so that
+    # readers (e.g. VS Code reloading the theme) never see a partially written file.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return True
+
+
+def load_manifest():
+    try:
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest):
+    write_if_changed(MANIFEST_PATH, json.dumps(manifest, indent=2))
+
+
+# Inputs shared by all variants, computed once by the main process and handed to each worker
+# process once, rather than with every task.
+_shared_syntax_colors = None
+_pretty = False
+
+
+def _init_worker(shared_syntax_colors, pretty):
+    global _shared_syntax_colors, _pretty
+    _shared_syntax_colors = shared_syntax_colors
+    _pretty = pretty
+
+
+def serialize_theme(theme, pretty=False):
+    if pretty:
+        return json.dumps(theme, indent=2)
+    return json.dumps(theme, sort_keys=True, separators=(',', ':'))
+
+
+def build_variant(variant, ui_colors):
+    '''Build a theme and write it out.
+
+    Returns whether it changed, its hash, and the sizes of the previous file and the new one.
+    '''
+    params = variant.params
+    theme = get_theme(
+        variant, ui_colors, _shared_syntax_colors[params['theme_type'], params['syntax']]
+    )
+
+    with stage('serialize', variant=variant.file_name):
+        content = serialize_theme(theme, _pretty)
+    path = os.path.join(THEMES_DIR, variant.file_name)
+    try:
+        previous_size = os.path.getsize(path)
+    except FileNotFoundError:
+        previous_size = 0
+    with stage('write', variant=variant.file_name):
+        changed = write_if_changed(path, content)
+    return changed, hashlib.sha256(content.encode()).hexdigest(), previous_size, \
+        len(content.encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate the color themes.')
+    parser.add_argument('--force', action='store_true',
+                        help='rebuild all themes, even those whose inputs are unchanged')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help='number of themes to build in parallel (default: number of CPUs)')
+    parser.add_argument('--pretty', action='store_true',
+                        help='write indented themes instead of minified ones, for debugging')
+    parser.add_argument('--accents', nargs='+', choices=[*ACCENT_COLORS, 'all'], default=['blue'],
+                        help='accent colors to build themes for (default: blue, the one published)')
+    parser.add_argument('--profile', nargs='?', const='build-profile.json', metavar='TRACE',
+                        help='rebuild all themes in this process, recording the time and memory '
+                             'used by each stage, and write a Chrome trace to TRACE '
+                             '(default: build-profile.json) and a summary next to it')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep running and rebuild themes whenever their inputs change')
+    parser.add_argument('--check', action='store_true',
+                        help="don't write anything, exit with an error if the themes or "
+                             'package.json are out of date')
+    args = parser.parse_args()
+    accents = tuple(ACCENT_COLORS) if 'all' in args.accents else args.accents
+
+    if args.check:
+        # Imported here, as the checker imports this module itself.
+        from check import check
+        sys.exit(0 if check(accents) else 1)
+
+    profiler = None
+    if args.profile:
+        # Worker processes would escape the profiler, and skipped themes would leave
+        # nothing to measure.
+        profiler = Profiler()
+        profiler.start()
+        args.jobs = 1
+        args.force = True
+
+    manifest = {} if args.force else load_manifest()
+    new_manifest = {}
+    skipped = []
+    changed = []
+    unchanged = []
+    stale = []
+    ui_colors_by_file = {}
+
+    package_json_entry = {
+        'contributes': {
+            'themes': []
+        }
     }
 
-    file_name = f'{name.lower().replace(" ", "-").replace("-&-", "-")}.json'
-    json.dump(theme, open(f'../themes/{file_name}', 'w'), indent=2)
+    for variant in get_variants(selected={'accent': accents}):
+        params = variant.params
+        file_name = variant.file_name
+        package_json_entry['contributes']['themes'].append(variant.get_package_json_entry())
+
+        with stage('ui colors', variant=file_name):
+            ui_colors = get_adwaita_ui_colors(
+                params['theme_type'], params['colorful_status_bar'], params['accent']
+            )
+        ui_colors_by_file[file_name] = ui_colors
+        with stage('input hashes', variant=file_name):
+            inputs = get_variant_inputs(params['theme_type'], params['syntax'], ui_colors)
+        inputs['pretty'] = args.pretty
+        previous = manifest.get(file_name, {})
+        path = os.path.join(THEMES_DIR, file_name)
+
+        # Also rebuild outputs that were deleted or edited by hand since the last build.
+        if previous.get('inputs') == inputs and os.path.exists(path) \
+                and hash_file(path) == previous.get('output'):
+            new_manifest[file_name] = previous
+            skipped.append(file_name)
+        else:
+            new_manifest[file_name] = {'inputs': inputs}
+            stale.append((variant, ui_colors))
+
+    shared_syntax_colors = {}
+    savings = []
+    for key in sorted({(variant.params['theme_type'], variant.params['syntax'])
+                       for variant, _ in stale}):
+        syntax_colors = get_syntax_colors(*key)
+        with stage('compact tokenColors', theme_type=key[0], syntax=key[1]):
+            compact = compact_token_colors(syntax_colors)
+        shared_syntax_colors[key] = compact
+        savings.append((key, len(syntax_colors), len(compact),
+                        len(serialize_theme(syntax_colors, args.pretty).encode()),
+                        len(serialize_theme(compact, args.pretty).encode())))
+
+    jobs = min(args.jobs, len(stale))
+    if jobs > 1:
+        with ProcessPoolExecutor(jobs, initializer=_init_worker,
+                                 initargs=(shared_syntax_colors, args.pretty)) as executor:
+            results = list(executor.map(build_variant, *zip(*stale)))
+    else:
+        _init_worker(shared_syntax_colors, args.pretty)
+        results = [build_variant(variant, ui_colors) for variant, ui_colors in stale]
+
+    total_previous_size = total_size = 0
+    for (variant, _ui_colors), (was_changed, output_hash, previous_size, size) in zip(stale, results):
+        (changed if was_changed else unchanged).append(variant.file_name)
+        new_manifest[variant.file_name]['output'] = output_hash
+        total_previous_size += previous_size
+        total_size += size
+
+    save_manifest(new_manifest)
+
+    if profiler is not None:
+        profiler.stop()
+        summary = profiler.write(args.profile)
+
+    for label, file_names in (
+        ('Updated', changed),
+        ('Rebuilt without changes', unchanged),
+        ('Skipped up-to-date (use --force to rebuild)', skipped)
+    ):
+        if file_names:
+            print(f'{label}: {len(file_names)} theme(s)')
+            for file_name in file_names:
+                print(f'  {file_name}')
+    print()
+
+    if savings:
+        print('tokenColors after compaction:')
+        for (theme_type, syntax), before, after, before_size, after_size in savings:
+            print(f'  {theme_type}, {syntax} syntax: {before} -> {after} rules, '
+                  f'{before_size / 1024:.1f} -> {after_size / 1024:.1f} KiB')
+        print(f'Wrote {len(stale)} theme(s), {total_size / 1024:.1f} KiB in total, '
+              f'previously {total_previous_size / 1024:.1f} KiB.')
+        print()
+
+    print('Suggested package.json entry:')
+    print(json.dumps(package_json_entry, indent=2)[2:-2])
+
+    if profiler is not None:
+        print()
+        print(summary)
+        print(f'Wrote a trace to {args.profile}, open it in chrome://tracing or ui.perfetto.dev.')
+
+    if args.watch:
+        # Imported here, as the watcher imports this module itself to reload it.
+        from watch import watch
+        print()
+        watch(accents, args.pretty, shared_syntax_colors, ui_colors_by_file)
 
-    package_json_entry['contributes']['themes'].append({
-        'label': name,
-        'uiTheme': 'vs-dark' if theme_type == 'dark' else 'vs',
-        'path': f'./themes/{file_name}'
-    })
 
-print('Suggested package.json entry:')
-print(json.dumps(package_json_entry, indent=2)[2:-2])
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+'''Build the product icon font from the SVGs in product-icons/scalable.
+
+Every SVG is normalized first: hard-coded fills become `currentColor`, and icons that aren't
+scaled down yet get `transform:scale(0.8)translate(2,2)`, which fits them to the size of VS Code's
+own icons. Normalized files are written back, so that they can be committed.
+
+Each shape is compiled to a TrueType outline and drawn as a COLRv1 layer in the text color, at
+the opacity of the shape. Compiled glyphs are cached by the hash of their normalized SVG, so
+adding or editing an icon only compiles that icon again. The iconDefinitions of adwaita.json
+are generated from product-icons/manifest.json, which maps icon ids to code points.
+
+The font is subset to the icons in the manifest, stripped of hinting and of the tables VS Code
+doesn't use, and written as WOFF2. The build checks that every icon in the manifest is drawn
+by the font, and prints a size report.
+
+Requires fontTools and brotli.
+'''
+import argparse
+import copy
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from fontTools.fontBuilder import FontBuilder
+from fontTools.misc.timeTools import epoch_diff
+from fontTools.misc.transform import Identity, Transform
+from fontTools.pens.cu2quPen import Cu2QuPen
+from fontTools.pens.recordingPen import RecordingPen
+from fontTools.pens.roundingPen import RoundingPen
+from fontTools.pens.transformPen import TransformPen
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fontTools.subset import Options, Subsetter
+from fontTools.svgLib.path import parse_path
+from fontTools.ttLib import TTFont
+from fontTools.ttLib.tables import otTables
+from build import write_if_changed
+
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+ICONS_DIR = os.path.join(SRC_DIR, '..', 'product-icons')
+SVG_DIR = os.path.join(ICONS_DIR, 'scalable')
+MANIFEST_PATH = os.path.join(ICONS_DIR, 'manifest.json')
+ICON_THEME_PATH = os.path.join(ICONS_DIR, 'adwaita.json')
+FONT_PATH = os.path.join(ICONS_DIR, 'adwaita-icons.woff2')
+
+# Compiled glyphs by the hash of their normalized SVG.
+CACHE_PATH = os.path.join(SRC_DIR, '.glyph-cache.json')
+
+# Bump this whenever a change to the compiler changes its output, to invalidate the cache.
+COMPILER_VERSION = 2
+
+FONT_ID = 'adwaita-icons'
+
+# The same metrics as the font nanoemoji used to build: the 16px grid of the icons spans from
+# the descender to the ascender and is centered horizontally.
+UNITS_PER_EM = 1024
+ASCENT = 950
+DESCENT = -250
+ADVANCE = 1275
+ICON_SIZE = 16
+# How far simplified outlines may deviate from the SVG, in font units. A pixel of the icon grid
+# is 75 units.
+TOLERANCE = 1
+FONT_TRANSFORM = Transform(
+    (ASCENT - DESCENT) / ICON_SIZE, 0, 0, -(ASCENT - DESCENT) / ICON_SIZE,
+    (ADVANCE - (ASCENT - DESCENT)) / 2, ASCENT
+)
+
+ICON_TRANSFORM = 'scale(0.8)translate(2,2)'
+
+# Palette index that stands for the text color in COLR.
+FOREGROUND = 0xFFFF
+
+SVG_NS = 'http://www.w3.org/2000/svg'
+SHAPES = {'path', 'rect', 'circle', 'ellipse', 'polygon', 'polyline'}
+# Elements that don't draw anything, and aren't moved into the transformed group.
+NOT_DRAWN = {'defs', 'metadata', 'title', 'desc', 'style'}
+
+
+def get_tag(element):
+    namespace, _, tag = element.tag.rpartition('}')
+    return tag if namespace in ('', '{' + SVG_NS) else None
+
+
+def parse_style(element):
+    style = {}
+    for declaration in element.get('style', '').split(';'):
+        name, _, value = declaration.partition(':')
+        if value:
+            style[name.strip()] = value.strip()
+    return style
+
+
+def set_style(element, style):
+    element.set('style', ';'.join(f'{name}:{value}' for name, value in style.items()))
+
+
+def get_property(element, name):
+    '''Get a presentation attribute, which the style attribute takes precedence over.'''
+    return parse_style(element).get(name, element.get(name))
+
+
+def parse_transform(value):
+    transform = Identity
+    for function, args in re.findall(r'([a-zA-Z]+)\s*\(([^)]*)\)', value or ''):
+        args = [float(arg) for arg in re.findall(r'[-+]?(?:\d*\.\d+|\d+\.?)(?:[eE][-+]?\d+)?', args)]
+        if function == 'matrix':
+            transform = transform.transform(args)
+        elif function == 'translate':
+            transform = transform.translate(args[0], args[1] if len(args) > 1 else 0)
+        elif function == 'scale':
+            transform = transform.scale(args[0], args[1] if len(args) > 1 else args[0])
+        elif function == 'rotate':
+            angle, cx, cy = (args + [0, 0])[:3]
+            transform = transform.translate(cx, cy).rotate(math.radians(angle)) \
+                .translate(-cx, -cy)
+        else:
+            raise ValueError(f'unsupported transform: {function}')
+    return transform
+
+
+def get_transform(element):
+    # Like in browsers, the CSS property, which the icons use, overrides the attribute.
+    return parse_transform(get_property(element, 'transform'))
+
+
+def normalize_svg(text):
+    '''Get an SVG with `currentColor` fills and the icon transform applied to its contents.
+
+    Returns the text unchanged if there's nothing to normalize.
+    '''
+    namespaces = dict(node for _event, node in ET.iterparse(io.StringIO(text), events=['start-ns']))
+    root = ET.fromstring(text)
+    changed = False
+
+    for element in root.iter():
+        fill = element.get('fill')
+        if fill not in (None, 'none', 'currentColor') and not fill.startswith('url('):
+            element.set('fill', 'currentColor')
+            changed = True
+        style = parse_style(element)
+        fill = style.get('fill')
+        if fill not in (None, 'none', 'currentColor') and not fill.startswith('url('):
+            style['fill'] = 'currentColor'
+            set_style(element, style)
+            changed = True
+
+    # Icons that have been scaled by hand may leave parts like background circles unscaled.
+    if not any('scale(0.8)' in (element.get('transform', '') + element.get('style', ''))
+               for element in root.iter()):
+        group = ET.Element(f'{{{SVG_NS}}}g', style=f'transform:{ICON_TRANSFORM}')
+        for child in list(root):
+            if get_tag(child) is not None and get_tag(child) not in NOT_DRAWN:
+                root.remove(child)
+                group.append(child)
+        root.append(group)
+        changed = True
+
+    if not changed:
+        return text
+    for prefix, uri in namespaces.items():
+        ET.register_namespace(prefix, uri)
+    return '<?xml version="1.0" encoding="UTF-8"?>\n' + ET.tostring(root, encoding='unicode') + '\n'
+
+
+def get_path_data(element, tag):
+    '''Get the path data of a shape element.'''
+    def number(name):
+        return float(element.get(name, 0))
+
+    if tag == 'path':
+        return element.get('d', '')
+    if tag in ('polygon', 'polyline'):
+        return 'M' + element.get('points', '') + (' Z' if tag == 'polygon' else '')
+    if tag in ('circle', 'ellipse'):
+        cx, cy = number('cx'), number('cy')
+        rx = number('r') if tag == 'circle' else number('rx')
+        ry = number('r') if tag == 'circle' else number('ry')
+        return (f'M {cx - rx},{cy} A {rx},{ry} 0 1 1 {cx + rx},{cy} '
+                f'A {rx},{ry} 0 1 1 {cx - rx},{cy} Z')
+    # A rect, possibly with rounded corners.
+    x, y, width, height = number('x'), number('y'), number('width'), number('height')
+    rx = min(number('rx') or number('ry'), width / 2)
+    ry = min(number('ry') or number('rx'), height / 2)
+    if not rx:
+        return f'M {x},{y} h {width} v {height} h {-width} Z'
+    return (f'M {x + rx},{y} H {x + width - rx} A {rx},{ry} 0 0 1 {x + width},{y + ry} '
+            f'V {y + height - ry} A {rx},{ry} 0 0 1 {x + width - rx},{y + height} '
+            f'H {x + rx} A {rx},{ry} 0 0 1 {x},{y + height - ry} '
+            f'V {y + ry} A {rx},{ry} 0 0 1 {x + rx},{y} Z')
+
+
+def iter_shapes(element, transform=Identity, opacity=1.0, fill='black', fill_opacity=1.0):
+    '''Yield (path data, transform, alpha) for every filled shape in an element.'''
+    for child in element:
+        tag = get_tag(child)
+        if tag is None or tag in NOT_DRAWN or get_property(child, 'display') == 'none':
+            continue
+        child_transform = transform.transform(get_transform(child))
+        child_opacity = opacity * float(get_property(child, 'opacity') or 1)
+        child_fill = get_property(child, 'fill') or fill
+        child_fill_opacity = float(get_property(child, 'fill-opacity') or fill_opacity)
+        if tag in SHAPES:
+            if child_fill != 'none':
+                yield get_path_data(child, tag), child_transform, \
+                    round(child_opacity * child_fill_opacity, 4)
+        else:
+            yield from iter_shapes(child, child_transform, child_opacity, child_fill,
+                                   child_fill_opacity)
+
+
+def compile_icon(svg):
+    '''Compile an SVG into layers of [alpha, quadratic outline drawing operations].'''
+    layers = []
+    for path_data, transform, alpha in iter_shapes(ET.fromstring(svg)):
+        recording = RecordingPen()
+        # Flipping the y axis reverses the direction of contours, so reverse them back.
+        pen = TransformPen(
+            Cu2QuPen(RoundingPen(recording), max_err=TOLERANCE, reverse_direction=True),
+            FONT_TRANSFORM.transform(transform)
+        )
+        parse_path(path_data, pen)
+
+        # Drop contours that are only a moveTo, like the trailing "m 0 0" of GNOME icons.
+        operations = []
+        for operation, points in recording.value:
+            if operation in ('closePath', 'endPath') and operations \
+                    and operations[-1][0] == 'moveTo':
+                operations.pop()
+            else:
+                operations.append([operation, [list(point) for point in points]])
+        operations = simplify(operations)
+        if operations:
+            layers.append([alpha, operations])
+    return layers
+
+
+def get_distance(point, start, end):
+    '''Get the distance of a point from a line segment.'''
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    length = dx * dx + dy * dy
+    t = 0
+    if length:
+        t = max(0, min(1, ((point[0] - start[0]) * dx + (point[1] - start[1]) * dy) / length))
+    return math.hypot(point[0] - start[0] - t * dx, point[1] - start[1] - t * dy)
+
+
+def simplify(operations):
+    '''Remove points that change an outline by less than TOLERANCE.
+
+    Curves that are nearly straight become lines, and points in the middle of a straight line,
+    or that don't move the pen, are dropped.
+    '''
+    result = []
+    current = start = None
+    for operation, points in operations:
+        if operation == 'moveTo':
+            current = start = points[0]
+        elif operation == 'qCurveTo' and points[-1] is not None and all(
+            get_distance(point, current, points[-1]) <= TOLERANCE for point in points[:-1]
+        ):
+            operation, points = 'lineTo', points[-1:]
+        elif operation in ('closePath', 'endPath'):
+            # The closing line back to the start is implied.
+            if operation == 'closePath' and result[-1][0] == 'lineTo' and result[-1][1][0] == start:
+                result.pop()
+            current = start = None
+
+        if operation == 'lineTo':
+            if points[0] == current:
+                continue
+            previous_operation, previous_points = result[-1]
+            if previous_operation == 'lineTo':
+                before = result[-2][1][-1]
+                if get_distance(previous_points[0], before, points[0]) <= TOLERANCE:
+                    result.pop()
+        result.append([operation, points])
+        if operation not in ('closePath', 'endPath'):
+            current = points[-1]
+    return result
+
+
+def draw_glyph(operations):
+    pen = TTGlyphPen(None)
+    for operation, points in operations:
+        getattr(pen, operation)(*map(tuple, points))
+    glyph = pen.glyph()
+    glyph.recalcBounds(None)
+    return glyph
+
+
+def get_origin(operations):
+    '''Move a layer to start at (0, 0), to find layers that differ only in their position.
+
+    Returns the moved operations and the position of the layer.
+    '''
+    x, y = operations[0][1][0]
+    return [
+        [operation, [[point[0] - x, point[1] - y] for point in points]]
+        for operation, points in operations
+    ], (x, y)
+
+
+def build_font(icons):
+    '''Build a COLRv1 font from {code point: layers}.
+
+    Layers with the same outline at different positions share a glyph, which is translated.
+    '''
+    glyph_order = ['.notdef', 'space']
+    glyphs = {name: TTGlyphPen(None).glyph() for name in glyph_order}
+    cmap = {ord(' '): 'space'}
+    for code_point in sorted(icons):
+        name = f'uni{code_point:04X}'
+        glyph_order.append(name)
+        glyphs[name] = TTGlyphPen(None).glyph()
+        cmap[code_point] = name
+
+    color_glyphs = {}
+    layer_glyphs = {}
+    for code_point, layers in sorted(icons.items()):
+        name = cmap[code_point]
+        paints = []
+        for index, (alpha, operations) in enumerate(layers):
+            moved, (x, y) = get_origin(operations)
+            key = json.dumps(moved)
+            if key not in layer_glyphs:
+                layer_glyphs[key] = f'{name}.{index}', (x, y)
+                glyph_order.append(f'{name}.{index}')
+                glyphs[f'{name}.{index}'] = draw_glyph(operations)
+            layer_name, (layer_x, layer_y) = layer_glyphs[key]
+            paint = {
+                'Format': otTables.PaintFormat.PaintGlyph,
+                'Paint': {
+                    'Format': otTables.PaintFormat.PaintSolid,
+                    'PaletteIndex': FOREGROUND,
+                    'Alpha': alpha
+                },
+                'Glyph': layer_name
+            }
+            if (x, y) != (layer_x, layer_y):
+                paint = {
+                    'Format': otTables.PaintFormat.PaintTranslate,
+                    'Paint': paint,
+                    'dx': x - layer_x,
+                    'dy': y - layer_y
+                }
+            paints.append(paint)
+        color_glyphs[name] = {'Format': otTables.PaintFormat.PaintColrLayers, 'Layers': paints}
+
+    # Fixed timestamps keep the font identical between builds of the same icons.
+    timestamp = int(os.environ.get('SOURCE_DATE_EPOCH', 0)) - epoch_diff
+    builder = FontBuilder(UNITS_PER_EM, isTTF=True)
+    builder.setupGlyphOrder(glyph_order)
+    builder.setupCharacterMap(cmap)
+    builder.setupGlyf(glyphs)
+    builder.setupHorizontalMetrics({
+        name: (ADVANCE, glyph.xMin if glyph.numberOfContours else 0)
+        for name, glyph in glyphs.items()
+    })
+    builder.setupHorizontalHeader(ascent=ASCENT, descent=DESCENT)
+    builder.setupHead(unitsPerEm=UNITS_PER_EM, created=timestamp, modified=timestamp)
+    builder.setupNameTable({'familyName': FONT_ID, 'styleName': 'Regular'})
+    builder.setupOS2(sTypoAscender=ASCENT, sTypoDescender=DESCENT, usWinAscent=ASCENT,
+                     usWinDescent=-DESCENT)
+    # Glyph names aren't needed by VS Code, so leave them out.
+    builder.setupPost(keepGlyphNames=False)
+    builder.setupCPAL([[(0, 0, 0, 1)]])
+    builder.setupCOLR(color_glyphs, version=1)
+    # Otherwise saving the font stamps it with the current time.
+    builder.font.recalcTimestamp = False
+    return builder.font
+
+
+def subset_font(ttf, code_points):
+    '''Get a font as WOFF2 with only the glyphs of `code_points` and the tables VS Code uses.'''
+    # Saving the subset would otherwise stamp it with the current time.
+    font = TTFont(io.BytesIO(ttf), recalcTimestamp=False)
+    options = Options()
+    options.flavor = 'woff2'
+    options.hinting = False
+    options.layout_features = []
+    options.name_IDs = [1, 2]
+    options.name_languages = [0x409]
+    options.glyph_names = False
+    options.notdef_outline = False
+    options.drop_tables += ['GDEF', 'GPOS', 'GSUB', 'DSIG', 'gasp', 'meta']
+    # The subsetter drops the palette, as the glyphs only use the text color, but browsers
+    # reject a COLR table without a CPAL table.
+    cpal = copy.deepcopy(font['CPAL'])
+    subsetter = Subsetter(options)
+    subsetter.populate(unicodes=code_points)
+    subsetter.subset(font)
+    font['CPAL'] = cpal
+
+    data = io.BytesIO()
+    font.flavor = 'woff2'
+    font.save(data)
+    return data.getvalue()
+
+
+def check_coverage(data, manifest):
+    '''Raise an exception unless every icon in the manifest is drawn by the font.'''
+    font = TTFont(io.BytesIO(data))
+    if 'CPAL' not in font:
+        raise Exception('the font has no CPAL table, which COLR requires')
+    cmap = font.getBestCmap()
+    colr = font['COLR'].table
+    paints = {record.BaseGlyph: record.Paint for record in colr.BaseGlyphList.BaseGlyphPaintRecord}
+    layers = colr.LayerList.Paint
+    glyf = font['glyf']
+
+    def get_glyphs(paint):
+        if paint.Format == otTables.PaintFormat.PaintColrLayers:
+            for layer in layers[paint.FirstLayerIndex:paint.FirstLayerIndex + paint.NumLayers]:
+                yield from get_glyphs(layer)
+        elif paint.Format == otTables.PaintFormat.PaintGlyph:
+            yield paint.Glyph
+        else:
+            yield from get_glyphs(paint.Paint)
+
+    for icon_id, code_point in manifest.items():
+        name = cmap.get(int(code_point, 16))
+        if name is None:
+            raise Exception(f'{icon_id}: U+{code_point.upper()} is missing from the font')
+        if name not in paints:
+            raise Exception(f'{icon_id}: {name} has no color glyph')
+        if not any(glyf[glyph].numberOfContours for glyph in get_glyphs(paints[name])):
+            raise Exception(f'{icon_id}: {name} is empty')
+
+
+def get_size_report(ttf, data):
+    '''Get the sizes of the font before subsetting, and of its WOFF2 and each table after.'''
+    subset = TTFont(io.BytesIO(data))
+    return {
+        'ttf_bytes': len(ttf),
+        'woff2_bytes': len(data),
+        'glyphs': len(subset.getGlyphOrder()),
+        'tables': {tag: len(subset.reader[tag]) for tag in sorted(subset.reader.keys())}
+    }
+
+
+def print_size_report(report):
+    print(f'Unsubsetted TTF: {report["ttf_bytes"]:>6} B')
+    print(f'WOFF2:           {report["woff2_bytes"]:>6} B '
+          f'({report["woff2_bytes"] / report["ttf_bytes"]:.0%}), {report["glyphs"]} glyphs')
+    print('Uncompressed tables: ' + ', '.join(
+        f'{tag.strip()} {size}' for tag, size in report['tables'].items()
+    ))
+
+
+def load_cache():
+    try:
+        with open(CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def get_icon_theme(manifest):
+    '''Get adwaita.json with iconDefinitions for the icons in the manifest.'''
+    with open(ICON_THEME_PATH) as f:
+        icon_theme = json.load(f)
+    icon_theme['fonts'][0]['src'] = [
+        {'path': f'./{os.path.basename(FONT_PATH)}', 'format': 'woff2'}
+    ]
+    icon_theme['iconDefinitions'] = {
+        icon_id: {'fontCharacter': f'\\{code_point}', 'fontId': FONT_ID}
+        for icon_id, code_point in manifest.items()
+    }
+    return icon_theme
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the product icon font.')
+    parser.add_argument('--force', action='store_true',
+                        help='compile all icons, even those that are cached')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help='number of icons to compile in parallel (default: number of CPUs)')
+    parser.add_argument('--report', metavar='PATH', help='also save the size report as JSON')
+    args = parser.parse_args()
+
+    with open(MANIFEST_PATH) as f:
+        manifest = json.load(f)
+    svg_names = sorted(name for name in os.listdir(SVG_DIR) if name.endswith('.svg'))
+    code_points = {name.removesuffix('.svg').lower() for name in svg_names}
+    for icon_id, code_point in manifest.items():
+        if code_point.lower() not in code_points:
+            raise Exception(f'no SVG for {icon_id}: {code_point}.svg')
+    in_manifest = {code_point.lower() for code_point in manifest.values()}
+    for code_point in sorted(code_points - in_manifest):
+        print(f'warning: {code_point}.svg is not in manifest.json')
+
+    svgs = {}
+    for name in svg_names:
+        path = os.path.join(SVG_DIR, name)
+        with open(path) as f:
+            text = f.read()
+        normalized = normalize_svg(text)
+        if normalized != text:
+            write_if_changed(path, normalized)
+            print(f'Normalized {name}')
+        svgs[int(name.removesuffix('.svg'), 16)] = normalized
+
+    cache = {} if args.force else load_cache()
+    keys = {
+        code_point: hashlib.sha256(f'{COMPILER_VERSION}\n{svg}'.encode()).hexdigest()
+        for code_point, svg in svgs.items()
+    }
+    stale = sorted({code_point for code_point, key in keys.items() if key not in cache})
+
+    jobs = min(args.jobs, len(stale))
+    if jobs > 1:
+        with ProcessPoolExecutor(jobs) as executor:
+            compiled = list(executor.map(compile_icon, [svgs[code_point] for code_point in stale]))
+    else:
+        compiled = [compile_icon(svgs[code_point]) for code_point in stale]
+    for code_point, layers in zip(stale, compiled):
+        cache[keys[code_point]] = layers
+
+    # Keep only the glyphs of the current icons.
+    cache = {key: cache[key] for key in keys.values()}
+    write_if_changed(CACHE_PATH, json.dumps(cache))
+
+    ttf = io.BytesIO()
+    build_font({code_point: cache[key] for code_point, key in keys.items()}).save(ttf)
+    ttf = ttf.getvalue()
+    data = subset_font(ttf, [int(code_point, 16) for code_point in manifest.values()])
+    check_coverage(data, manifest)
+    font_changed = write_if_changed(FONT_PATH, data)
+
+    icon_theme_changed = write_if_changed(
+        ICON_THEME_PATH, json.dumps(get_icon_theme(manifest), indent=2) + '\n'
+    )
+
+    print(f'Compiled {len(stale)} icon(s), {len(svgs) - len(stale)} cached.')
+    report = get_size_report(ttf, data)
+    print_size_report(report)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(f'{os.path.basename(FONT_PATH)}: {"updated" if font_changed else "unchanged"}')
+    print(f'{os.path.basename(ICON_THEME_PATH)}: '
+          f'{"updated" if icon_theme_changed else "unchanged"}')
+
+
+if __name__ == '__main__':
+    main()
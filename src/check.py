@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+'''Check that the committed themes and the themes list in package.json are up to date.
+
+    python3 build.py --check
+
+Every variant is built in memory and compared to its file in `themes`, first byte for byte
+against the minified form `build.py` writes, and then by a hash of the parsed JSON, so that
+themes written with `--pretty` still match. Only themes that differ are diffed, by color key
+and by tokenColors selector. Nothing is written.
+'''
+import json
+import os
+from adwaita_theme import get_theme, get_token_colors
+from adwaita_ui_colors import get_adwaita_ui_colors
+from build import SRC_DIR, THEMES_DIR, hash_json, serialize_theme
+from variants import get_variants
+
+
+PACKAGE_JSON_PATH = os.path.join(SRC_DIR, '..', 'package.json')
+
+# Changes listed per section of a theme, beyond which they're only counted.
+MAX_CHANGES = 10
+
+
+def get_selector_settings(token_colors):
+    '''Map each selector to the settings it ends up with. Later rules override earlier ones.'''
+    settings = {}
+    for rule in token_colors:
+        scopes = rule.get('scope', '')
+        if isinstance(scopes, str):
+            scopes = scopes.split(',')
+        for scope in scopes:
+            settings.setdefault(scope.strip(), {}).update(rule['settings'])
+    return settings
+
+
+def diff_mappings(committed, generated):
+    '''Get (key, committed value, generated value) for every key that differs.'''
+    return [
+        (key, committed.get(key), generated.get(key))
+        for key in sorted(committed.keys() | generated.keys())
+        if committed.get(key) != generated.get(key)
+    ]
+
+
+def format_changes(title, changes):
+    lines = [f'    {title}: {len(changes)} changed']
+    for key, committed, generated in changes[:MAX_CHANGES]:
+        if committed is None:
+            lines.append(f'      + {key}: {json.dumps(generated)}')
+        elif generated is None:
+            lines.append(f'      - {key}: {json.dumps(committed)}')
+        else:
+            lines.append(f'      ~ {key}: {json.dumps(committed)} -> {json.dumps(generated)}')
+    if len(changes) > MAX_CHANGES:
+        lines.append(f'      ... and {len(changes) - MAX_CHANGES} more')
+    return lines
+
+
+def diff_theme(committed, generated):
+    '''Describe how a committed theme differs from the generated one, section by section.'''
+    lines = []
+    other_keys = (committed.keys() | generated.keys()) - {'colors', 'tokenColors'}
+    other = diff_mappings({key: committed.get(key) for key in other_keys},
+                          {key: generated.get(key) for key in other_keys})
+    if other:
+        lines += format_changes('properties', other)
+    colors = diff_mappings(committed.get('colors', {}), generated.get('colors', {}))
+    if colors:
+        lines += format_changes('colors', colors)
+    token_colors = diff_mappings(get_selector_settings(committed.get('tokenColors', [])),
+                                 get_selector_settings(generated.get('tokenColors', [])))
+    if token_colors:
+        lines += format_changes('tokenColors selectors', token_colors)
+    elif committed.get('tokenColors') != generated.get('tokenColors'):
+        # Every selector gets the same settings, but from differently grouped rules.
+        lines.append('    tokenColors: same settings per selector, but the rules differ')
+    return lines
+
+
+def check_themes(variants):
+    '''Get the problems of each out-of-date theme file, keyed by file name.'''
+    problems = {}
+    for variant in variants:
+        params = variant.params
+        generated = get_theme(
+            variant,
+            get_adwaita_ui_colors(params['theme_type'], params['colorful_status_bar'], params['accent']),
+            get_token_colors(params['theme_type'], params['syntax'])
+        )
+        try:
+            with open(os.path.join(THEMES_DIR, variant.file_name), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            problems[variant.file_name] = ['    missing']
+            continue
+
+        # Most themes are identical to what build.py would write, which is cheap to compare.
+        if data == serialize_theme(generated).encode():
+            continue
+        try:
+            committed = json.loads(data)
+        except ValueError as e:
+            problems[variant.file_name] = [f'    invalid JSON: {e}']
+            continue
+        if hash_json(committed) != hash_json(generated):
+            problems[variant.file_name] = diff_theme(committed, generated)
+    return problems
+
+
+def check_package_json(variants):
+    '''Get the problems of the themes list in package.json.'''
+    with open(PACKAGE_JSON_PATH) as f:
+        committed = json.load(f)['contributes']['themes']
+    generated = [variant.get_package_json_entry() for variant in variants]
+    if committed == generated:
+        return []
+    if sorted(map(hash_json, committed)) == sorted(map(hash_json, generated)):
+        return ['    themes are listed in a different order']
+    return format_changes('themes', diff_mappings(
+        {entry.get('path'): entry for entry in committed},
+        {entry['path']: entry for entry in generated}
+    ))
+
+
+def check(accents):
+    '''Print what's out of date for the given accents. Returns whether everything is up to date.'''
+    variants = list(get_variants(selected={'accent': accents}))
+    problems = check_themes(variants)
+    package_json_problems = check_package_json(variants)
+    if package_json_problems:
+        problems['package.json'] = package_json_problems
+
+    if not problems:
+        print(f'All {len(variants)} theme(s) and package.json are up to date.')
+        return True
+    for name, lines in problems.items():
+        print(name)
+        for line in lines:
+            print(line)
+    print(f'\n{len(problems)} file(s) out of date, run build.py to update them.')
+    return False
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+import math
+
+
+def parse_hex(color):
+    '''Parse "#rgb", "#rrggbb" or "#rrggbbaa" into a tuple of (r, g, b, a) floats in 0..1.'''
+    digits = color.lstrip('#')
+    if len(digits) in (3, 4):
+        digits = ''.join(digit * 2 for digit in digits)
+    if len(digits) == 6:
+        digits += 'ff'
+    if len(digits) != 8:
+        raise ValueError(f'invalid color: {color}')
+    value = int(digits, 16)
+    return (
+        (value >> 24) / 255,
+        (value >> 16 & 0xff) / 255,
+        (value >> 8 & 0xff) / 255,
+        (value & 0xff) / 255
+    )
+
+
+def format_hex(rgba):
+    '''Format (r, g, b) or (r, g, b, a) as "#RRGGBB", adding alpha only if it's not opaque.'''
+    channels = [min(max(round(channel * 255), 0), 255) for channel in rgba]
+    if len(channels) == 4 and channels[3] == 255:
+        channels.pop()
+    return '#' + ''.join(f'{channel:02X}' for channel in channels)
+
+
+def with_alpha(color, alpha):
+    '''Replace the alpha of a hex color with `alpha`, an integer in 0..255.'''
+    return f'{color[:7]}{alpha:02x}'
+
+
+def _to_linear(channel):
+    if channel <= 0.04045:
+        return channel / 12.92
+    return ((channel + 0.055) / 1.055) ** 2.4
+
+
+def _from_linear(channel):
+    if channel <= 0.0031308:
+        return channel * 12.92
+    return 1.055 * math.copysign(abs(channel) ** (1 / 2.4), channel) - 0.055
+
+
+def srgb_to_oklab(rgb):
+    '''Convert many (r, g, b) sRGB colors to OKLab (L, a, b) at once.'''
+    result = []
+    for color in rgb:
+        r, g, b = (_to_linear(channel) for channel in color[:3])
+        l = (0.4122214708 * r + 0.5363325363 * g + 0.0514459929 * b) ** (1 / 3)
+        m = (0.2119034982 * r + 0.6806995451 * g + 0.1073969566 * b) ** (1 / 3)
+        s = (0.0883024619 * r + 0.2817188376 * g + 0.6299787005 * b) ** (1 / 3)
+        result.append((
+            0.2104542553 * l + 0.7936177850 * m - 0.0040720468 * s,
+            1.9779984951 * l - 2.4285922050 * m + 0.4505937099 * s,
+            0.0259040371 * l + 0.7827717662 * m - 0.8086757660 * s
+        ))
+    return result
+
+
+def oklab_to_srgb(lab):
+    '''Convert many OKLab (L, a, b) colors to sRGB (r, g, b), possibly out of gamut.'''
+    result = []
+    for lightness, a, b in lab:
+        l = (lightness + 0.3963377774 * a + 0.2158037573 * b) ** 3
+        m = (lightness - 0.1055613458 * a - 0.0638541728 * b) ** 3
+        s = (lightness - 0.0894841775 * a - 1.2914855480 * b) ** 3
+        result.append(tuple(_from_linear(channel) for channel in (
+            4.0767416621 * l - 3.3077115913 * m + 0.2309699292 * s,
+            -1.2684380046 * l + 2.6097574011 * m - 0.3413193965 * s,
+            -0.0041960863 * l - 0.7034186147 * m + 1.7076147010 * s
+        )))
+    return result
+
+
+def oklab_to_oklch(lab):
+    return [(lightness, math.hypot(a, b), math.atan2(b, a)) for lightness, a, b in lab]
+
+
+def oklch_to_oklab(lch):
+    return [
+        (lightness, chroma * math.cos(hue), chroma * math.sin(hue))
+        for lightness, chroma, hue in lch
+    ]
+
+
+def _in_gamut(rgb, epsilon=1e-6):
+    return all(-epsilon <= channel <= 1 + epsilon for channel in rgb)
+
+
+def oklch_to_srgb(lch):
+    '''Convert many OKLCh colors to sRGB, reducing chroma of out-of-gamut colors to fit.'''
+    result = oklab_to_srgb(oklch_to_oklab(lch))
+    for index, rgb in enumerate(result):
+        if _in_gamut(rgb):
+            continue
+        lightness, chroma, hue = lch[index]
+        low, high = 0.0, chroma
+        for _ in range(24):
+            middle = (low + high) / 2
+            [candidate] = oklab_to_srgb(oklch_to_oklab([(lightness, middle, hue)]))
+            if _in_gamut(candidate):
+                low, rgb = middle, candidate
+            else:
+                high = middle
+        result[index] = rgb
+    return result
+
+
+def transfer_shades(base, reference_base, reference_shades):
+    '''Derive shades of `base` that relate to it like `reference_shades` do to `reference_base`.
+
+    Works in OKLCh: each reference shade's lightness offset, chroma ratio and hue offset from
+    the reference base are applied to `base`, for all shades in one pass. If `base` is the
+    reference base itself, the reference shades are returned unchanged.
+    '''
+    if base.lower() == reference_base.lower():
+        return list(reference_shades)
+
+    [base_lch, reference_lch] = oklab_to_oklch(srgb_to_oklab(
+        [parse_hex(base), parse_hex(reference_base)]
+    ))
+    shades_lch = oklab_to_oklch(srgb_to_oklab(parse_hex(shade) for shade in reference_shades))
+
+    chroma_ratio = base_lch[1] / reference_lch[1] if reference_lch[1] else 0
+    derived = oklch_to_srgb([
+        (
+            min(max(base_lch[0] + lightness - reference_lch[0], 0), 1),
+            chroma * chroma_ratio,
+            base_lch[2] + hue - reference_lch[2]
+        )
+        for lightness, chroma, hue in shades_lch
+    ])
+    return [format_hex(rgb) for rgb in derived]
+
+
+def composite(layers):
+    '''Blend (r, g, b, a) layers, given topmost first, over black into an opaque (r, g, b).'''
+    r = g = b = 0.0
+    for layer_r, layer_g, layer_b, alpha in reversed(layers):
+        r = layer_r * alpha + r * (1 - alpha)
+        g = layer_g * alpha + g * (1 - alpha)
+        b = layer_b * alpha + b * (1 - alpha)
+    return r, g, b
+
+
+def relative_luminance(rgb):
+    '''Get the WCAG relative luminance of many (r, g, b) colors at once.'''
+    return [
+        0.2126 * _to_linear(r) + 0.7152 * _to_linear(g) + 0.0722 * _to_linear(b)
+        for r, g, b in rgb
+    ]
+
+
+def contrast_ratios(foregrounds, backgrounds):
+    '''Get WCAG contrast ratios of many opaque (r, g, b) color pairs at once.'''
+    return [
+        (max(a, b) + 0.05) / (min(a, b) + 0.05)
+        for a, b in zip(relative_luminance(foregrounds), relative_luminance(backgrounds))
+    ]
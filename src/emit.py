@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+'''Generate the themes in other formats from the intermediate representation in `theme_ir`.
+
+    python3 emit.py --targets kitty alacritty --out /tmp/adwaita
+
+Each target is an emitter, a generator that takes the IR of every variant and yields
+(file name, content) pairs. All targets are emitted in one run from an IR that's built, or
+loaded from its cache, only once. To add a target, decorate a generator with `@emitter(name)`.
+'''
+import argparse
+import os
+from xml.sax.saxutils import escape, quoteattr
+from adwaita_theme import get_theme, with_extra_syntax_colors
+from adwaita_ui_colors import ACCENT_COLORS
+from build import serialize_theme, write_if_changed
+from scopes import compact_token_colors
+from theme_ir import get_variant_irs
+from variants import Variant
+
+
+EMITTERS = {}
+
+
+def emitter(name):
+    def decorator(function):
+        EMITTERS[name] = function
+        return function
+    return decorator
+
+
+def get_slug(variant):
+    return variant.name.lower().replace(' ', '-').replace('-&-', '-')
+
+
+@emitter('vscode')
+def emit_vscode(variants):
+    '''VS Code color themes with Adwaita syntax highlighting, like build.py writes them.'''
+    token_colors = {}
+    for variant in variants:
+        scheme = variant.scheme
+        if scheme.theme_type not in token_colors:
+            token_colors[scheme.theme_type] = compact_token_colors(
+                with_extra_syntax_colors([rule.to_textmate() for rule in scheme.rules])
+            )
+        theme = get_theme(Variant(variant.params), variant.ui_colors,
+                          token_colors[scheme.theme_type])
+        yield f'vscode/{get_slug(variant)}.json', serialize_theme(theme)
+
+
+@emitter('gtksourceview')
+def emit_gtksourceview(variants):
+    '''The GtkSourceView schemes the IR was built from, one per theme type.'''
+    schemes = {variant.scheme.theme_type: variant.scheme for variant in variants}
+    for theme_type, scheme in schemes.items():
+        attributes = ''.join(f' {key}={quoteattr(value)}' for key, value in scheme.attributes.items())
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>', f'<style-scheme{attributes}>']
+        for tag, value in scheme.metadata:
+            if tag == 'metadata':
+                lines.append('  <metadata>')
+                for name, text in value:
+                    lines.append(f'    <property name={quoteattr(name)}>{escape(text)}</property>')
+                lines.append('  </metadata>')
+            else:
+                lines.append(f'  <{tag}>{escape(value or "")}</{tag}>')
+        lines.append('')
+        for name, value in scheme.palette.items():
+            lines.append(f'  <color name={quoteattr(name)} value={quoteattr(value)}/>')
+        lines.append('')
+        for style in scheme.styles:
+            attributes = ''.join(f' {key}={quoteattr(value)}' for key, value in style.attributes.items())
+            lines.append(f'  <style name={quoteattr(style.name)}{attributes}/>')
+        lines.append('</style-scheme>')
+        file_name = 'Adwaita-dark.xml' if theme_type == 'dark' else 'Adwaita.xml'
+        yield f'gtksourceview/{file_name}', '\n'.join(lines) + '\n'
+
+
+@emitter('kitty')
+def emit_kitty(variants):
+    '''kitty terminal color schemes, for `include` in kitty.conf.'''
+    for variant in variants:
+        # The status bar doesn't exist in a terminal.
+        if variant.params['colorful_status_bar']:
+            continue
+        roles = variant.roles
+        lines = [
+            f'# {variant.name}',
+            f'background {roles["background"]}',
+            f'foreground {roles["foreground"]}',
+            f'cursor {roles["cursor"]}',
+            f'selection_background {roles["selection_background"]}',
+            f'selection_foreground {roles["selection_foreground"]}',
+            f'url_color {roles["accent"]}',
+            f'active_border_color {roles["accent"]}',
+            f'inactive_border_color {roles["border"]}'
+        ]
+        lines += [f'color{index} {color}' for index, color in enumerate(roles['terminal'])]
+        yield f'kitty/{get_slug(variant)}.conf', '\n'.join(lines) + '\n'
+
+
+ANSI_NAMES = ('black', 'red', 'green', 'yellow', 'blue', 'magenta', 'cyan', 'white')
+
+
+@emitter('alacritty')
+def emit_alacritty(variants):
+    '''Alacritty color schemes, for `import` in alacritty.toml.'''
+    for variant in variants:
+        if variant.params['colorful_status_bar']:
+            continue
+        roles = variant.roles
+        lines = [
+            f'# {variant.name}',
+            '[colors.primary]',
+            f'background = "{roles["background"]}"',
+            f'foreground = "{roles["foreground"]}"',
+            '',
+            '[colors.cursor]',
+            f'cursor = "{roles["cursor"]}"',
+            f'text = "{roles["background"]}"',
+            '',
+            '[colors.selection]',
+            f'background = "{roles["selection_background"]}"',
+            f'text = "{roles["selection_foreground"]}"'
+        ]
+        for section, colors in ('normal', roles['terminal'][:8]), ('bright', roles['terminal'][8:]):
+            lines += ['', f'[colors.{section}]']
+            lines += [f'{name} = "{color}"' for name, color in zip(ANSI_NAMES, colors)]
+        yield f'alacritty/{get_slug(variant)}.toml', '\n'.join(lines) + '\n'
+
+
+def emit(targets, variants, out_dir):
+    '''Write the files of every target. Returns the number of files written and unchanged.'''
+    written = unchanged = 0
+    for target in targets:
+        for file_name, content in EMITTERS[target](variants):
+            path = os.path.join(out_dir, file_name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if write_if_changed(path, content):
+                written += 1
+            else:
+                unchanged += 1
+    return written, unchanged
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate the themes in other formats.')
+    parser.add_argument('--targets', nargs='+', choices=[*EMITTERS, 'all'], default=['all'],
+                        help='formats to generate (default: all)')
+    parser.add_argument('--out', default='out', help='directory to write to (default: out)')
+    parser.add_argument('--accents', nargs='+', choices=[*ACCENT_COLORS, 'all'], default=['blue'],
+                        help='accent colors to generate themes for (default: blue)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help="build the IR from the schemes, and don't cache it")
+    parser.add_argument('--list', action='store_true', help='list the targets and exit')
+    args = parser.parse_args()
+
+    if args.list:
+        for name, function in EMITTERS.items():
+            print(f'{name:<16} {function.__doc__}')
+        return
+
+    targets = list(EMITTERS) if 'all' in args.targets else args.targets
+    accents = tuple(ACCENT_COLORS) if 'all' in args.accents else tuple(args.accents)
+    variants = get_variant_irs(accents, use_cache=not args.no_cache)
+    written, unchanged = emit(targets, variants, args.out)
+    print(f'{", ".join(targets)}: wrote {written} file(s), {unchanged} unchanged, to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
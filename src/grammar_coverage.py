@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+'''Check how the selectors in `adwaita_colors.MAP` cover the scopes of TextMate grammars.
+
+Point it at directories with grammars, e.g. the `extensions` directory of a VS Code install
+and `~/.vscode/extensions`. Every scope name declared in `*.tmLanguage.json`, `*.tmGrammar.json`
+and `*.tmLanguage` files is indexed. The index is cached on disk and only files that changed
+since the last run are parsed again.
+
+Reported are MAP selectors that match no scope, scopes that fall through to the default text
+color, and scopes for which several styles are equally specific.
+'''
+import argparse
+import json
+import os
+import plistlib
+import sys
+from collections import defaultdict
+from adwaita_colors import MAP
+from build import write_if_changed
+
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.path.join(SRC_DIR, '.grammar-index.json')
+GRAMMAR_SUFFIXES = ('.tmLanguage.json', '.tmGrammar.json', '.tmLanguage')
+NAME_KEYS = ('scopeName', 'name', 'contentName')
+
+
+def load_grammar(path):
+    if path.endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    with open(path, 'rb') as f:
+        return plistlib.load(f)
+
+
+def get_grammar_scopes(grammar):
+    '''Get every scope name declared anywhere in a grammar.'''
+    scopes = set()
+    pending = [grammar]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key in NAME_KEYS and isinstance(value, str):
+                    # A name may hold several scopes. Ones built from captures
+                    # ("keyword.$1.js") can't be known in advance.
+                    scopes.update(scope for scope in value.split() if '$' not in scope)
+                else:
+                    pending.append(value)
+        elif isinstance(node, list):
+            pending.extend(node)
+    return scopes
+
+
+def iter_grammar_files(directories):
+    for directory in directories:
+        for root, _dirs, files in os.walk(directory):
+            for file in files:
+                if file.endswith(GRAMMAR_SUFFIXES):
+                    yield os.path.join(root, file)
+
+
+def update_index(directories, cache_path=CACHE_PATH):
+    '''Get {path: [scopes]} for all grammars, parsing only files changed since the last run.'''
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+
+    index = {}
+    parsed = 0
+    for path in iter_grammar_files(directories):
+        stat = os.stat(path)
+        entry = cache.get(path)
+        if entry is None or entry['mtime'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+            try:
+                scopes = sorted(get_grammar_scopes(load_grammar(path)))
+            except Exception as e:
+                print(f'warning: could not read {path}: {e}', file=sys.stderr)
+                scopes = []
+            entry = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'scopes': scopes}
+            parsed += 1
+        index[path] = entry
+
+    if parsed or index.keys() != cache.keys():
+        write_if_changed(cache_path, json.dumps(index))
+
+    return {path: entry['scopes'] for path, entry in index.items()}, parsed
+
+
+def iter_prefixes(scope):
+    '''Yield "a.b.c", "a.b" and "a" for "a.b.c".'''
+    while scope:
+        yield scope
+        scope = scope.rpartition('.')[0]
+
+
+def get_coverage(scopes, style_map=MAP):
+    all_prefixes = set()
+    for scope in scopes:
+        all_prefixes.update(iter_prefixes(scope))
+
+    # The styles of each selector, indexed by the last scope in the selector.
+    styles_by_last_scope = defaultdict(lambda: defaultdict(set))
+    unmatched_selectors = []
+    for style_name, selectors in style_map.items():
+        for selector in selectors:
+            segments = selector.split()
+            if not segments:
+                continue
+            styles_by_last_scope[segments[-1]][selector].add(style_name)
+            if not all(segment in all_prefixes for segment in segments):
+                unmatched_selectors.append((style_name, selector))
+
+    default_color = []
+    ambiguous = {}
+    for scope in sorted(scopes):
+        # Find the most specific selectors that apply regardless of parent scopes. Selectors
+        # with parent scopes on the way there only apply in some contexts.
+        conditional = False
+        styles = set()
+        for prefix in iter_prefixes(scope):
+            for selector, selector_styles in styles_by_last_scope.get(prefix, {}).items():
+                if ' ' in selector:
+                    conditional = True
+                else:
+                    styles |= selector_styles
+            if styles:
+                break
+
+        if styles <= {'text'} and not conditional:
+            default_color.append(scope)
+        elif len(styles) > 1:
+            # Only the last of these styles in MAP wins.
+            ambiguous[scope] = sorted(styles)
+
+    return unmatched_selectors, default_color, ambiguous
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Report how MAP selectors cover the scopes declared by TextMate grammars.'
+    )
+    parser.add_argument('directories', nargs='+', help='directories to search for grammars')
+    parser.add_argument('--cache', default=CACHE_PATH, help=f'index cache (default: {CACHE_PATH})')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    index, parsed = update_index(args.directories, args.cache)
+    scopes = set()
+    for grammar_scopes in index.values():
+        scopes.update(grammar_scopes)
+
+    unmatched_selectors, default_color, ambiguous = get_coverage(scopes)
+
+    if args.json:
+        print(json.dumps({
+            'grammars': len(index),
+            'scopes': len(scopes),
+            'unmatched_selectors': [
+                {'style': style_name, 'selector': selector}
+                for style_name, selector in unmatched_selectors
+            ],
+            'default_color_scopes': default_color,
+            'ambiguous_scopes': ambiguous
+        }, indent=2))
+        return
+
+    print(f'Indexed {len(scopes)} scopes from {len(index)} grammars ({parsed} parsed, '
+          f'{len(index) - parsed} cached).')
+
+    print(f'\nSelectors that match no scope ({len(unmatched_selectors)}):')
+    for style_name, selector in unmatched_selectors:
+        print(f'  {style_name}: {selector}')
+
+    print(f'\nScopes with the default text color ({len(default_color)}):')
+    for scope in default_color:
+        print(f'  {scope}')
+
+    print(f'\nScopes matched by several styles ({len(ambiguous)}):')
+    for scope, styles in ambiguous.items():
+        print(f'  {scope}: {", ".join(styles)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+import json
+import re
+
+
+_STRING = r'"[^"\\\n]*(?:\\.[^"\\\n]*)*"'
+_BLOCK_COMMENT = r'/\*[^*]*\*+(?:[^/*][^*]*\*+)*/'
+# A line comment runs to the end of the line, so that it can't end early at a "]" or "}" in it.
+_COMMENT = rf'//[^\n]*(?:\n|\Z)|{_BLOCK_COMMENT}'
+# A block comment or a "/" that is cut off by the end of the buffer.
+_UNTERMINATED_COMMENT = r'/(?:\*[^*]*(?:\*+[^/*][^*]*)*\**)?\Z'
+
+# Only whitespace and comments until the end of an object or array.
+_CLOSES = rf'(?:\s|{_COMMENT})*[\]}}]'
+
+_TOKEN = re.compile(
+    # Strings, along with anything but comments and trailing commas between them. Matching
+    # long runs of plain JSON at once keeps the number of substitutions low.
+    rf'(?P<string>{_STRING}(?:[^"/,]*(?:,(?!{_CLOSES})[^"/,]*)*{_STRING})*)'
+    # Same for runs of line comments on consecutive lines.
+    rf'|//[^\n]*(?:\n[ \t]*//[^\n]*)*(?P<newline>\n)?'
+    rf'|(?P<block_comment>{_BLOCK_COMMENT})'
+    rf'|(?P<trailing_comma>,(?={_CLOSES}))'
+    # A comma that may or may not turn out to be trailing once more input arrives.
+    rf'|(?P<undecided_comma>,(?=(?:\s|{_COMMENT})*(?:{_UNTERMINATED_COMMENT})?\Z))'
+    rf'|{_UNTERMINATED_COMMENT}|"'
+)
+
+
+class JsoncScanner:
+    '''Incrementally convert JSON with comments and trailing commas to plain JSON.
+
+    Feed the input in chunks of any size; each call returns the JSON text that could be
+    produced so far. Tokens that are split between chunks are carried over to the next call.
+    Strings, comments and commas are found by a single precompiled pattern in one
+    substitution pass; everything else is copied through as is.
+    '''
+    __slots__ = ('_carry',)
+
+    def __init__(self):
+        self._carry = ''
+
+    def feed(self, chunk):
+        return self._scan(self._carry + chunk, final=False) if chunk else ''
+
+    def close(self):
+        return self._scan(self._carry, final=True)
+
+    def _scan(self, buf, final):
+        # Output offset relative to the input, and where the first incomplete token starts
+        # in the input and in the output.
+        shift = 0
+        cut = None
+
+        def replace(match):
+            nonlocal shift, cut
+            kind = match.lastgroup
+            if kind == 'string' or cut is not None:
+                return match.group()
+            if kind == 'newline':
+                # Keep line breaks, so that decoder errors point to the right line.
+                replacement = '\n' * match.group().count('\n')
+            elif kind in ('block_comment', 'trailing_comma') \
+                    or (final and match.group().startswith('//')):
+                replacement = ''
+            elif final:
+                # Anything else cut off by the end of the input is invalid JSON, which is left
+                # for the decoder to report.
+                return match.group()
+            else:
+                cut = match.start(), match.start() + shift
+                return match.group()
+            shift += len(replacement) - (match.end() - match.start())
+            return replacement
+
+        out = _TOKEN.sub(replace, buf)
+        if cut is None:
+            self._carry = ''
+            return out
+        self._carry = buf[cut[0]:]
+        return out[:cut[1]]
+
+
+def strip_jsonc(text):
+    r'''Convert JSON with comments and trailing commas to plain JSON.
+
+    >>> strip_jsonc('[1, // see [a]\n 2,\n]')
+    '[1, \n 2\n]'
+    >>> strip_jsonc('{"a": 1, // {"b": 2}\n "c": 3}')
+    '{"a": 1, \n "c": 3}'
+    '''
+    scanner = JsoncScanner()
+    return scanner.feed(text) + scanner.close()
+
+
+def load_jsonc(path, chunk_size=1 << 16):
+    '''Read JSON with comments.'''
+    scanner = JsoncScanner()
+    parts = []
+    with open(path) as f:
+        while chunk := f.read(chunk_size):
+            parts.append(scanner.feed(chunk))
+    parts.append(scanner.close())
+    return json.loads(''.join(parts))
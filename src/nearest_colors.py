@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+'''Snap colors to the nearest color of a palette, by distance in OKLab.'''
+from color_math import parse_hex, srgb_to_oklab, with_alpha
+
+
+class KDTree:
+    '''A k-d tree of 3D points with values, for finding the value of the point nearest to another.'''
+    __slots__ = ('_root',)
+
+    def __init__(self, points, values):
+        def build(items, axis):
+            if not items:
+                return None
+            items.sort(key=lambda item: item[0][axis])
+            middle = len(items) // 2
+            (x, y, z), value = items[middle]
+            next_axis = (axis + 1) % 3
+            return (x, y, z, value, axis,
+                    build(items[:middle], next_axis), build(items[middle + 1:], next_axis))
+
+        self._root = build(list(zip(points, values)), 0)
+
+    def nearest(self, target):
+        tx, ty, tz = target
+        best_distance = float('inf')
+        best_value = None
+        # Subtrees to visit, with the squared distance to the plane that separates them from
+        # the target. The far side of a plane is pushed first, so that by the time it's popped,
+        # the near side may have found a point closer than the plane.
+        stack = [(self._root, 0)]
+        while stack:
+            node, plane_distance = stack.pop()
+            if node is None or plane_distance >= best_distance:
+                continue
+            x, y, z, value, axis, left, right = node
+            distance = (x - tx) ** 2 + (y - ty) ** 2 + (z - tz) ** 2
+            if distance < best_distance:
+                best_distance, best_value = distance, value
+            offset = target[axis] - node[axis]
+            if offset < 0:
+                stack.append((right, offset * offset))
+                stack.append((left, 0))
+            else:
+                stack.append((left, offset * offset))
+                stack.append((right, 0))
+        return best_value
+
+
+def snap_colors(colors, palette):
+    '''Replace each of `colors` with the nearest opaque color of `palette`, keeping its alpha.
+
+    `colors` maps keys to hex colors. Each distinct color is looked up only once.
+    '''
+    tree = KDTree(srgb_to_oklab([parse_hex(color) for color in palette]), palette)
+    rgba = {key: parse_hex(color) for key, color in colors.items()}
+    distinct = sorted({color[:3] for color in rgba.values()})
+    nearest = dict(zip(distinct, map(tree.nearest, srgb_to_oklab(distinct))))
+
+    snapped = {}
+    for key, color in rgba.items():
+        match = nearest[color[:3]]
+        alpha = round(color[3] * 255)
+        snapped[key] = match if alpha == 255 else with_alpha(match, alpha)
+    return snapped
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+'''Optional profiling of the theme build, enabled by `build.py --profile`.
+
+Code marks its stages with `with stage('name', **args):`, which does next to nothing unless a
+profiler is running. Each stage records its wall time, the change in allocated memory blocks
+and traced bytes, and the peak of traced memory while it ran. Stages may be nested, in which
+case the outer stage includes the inner ones. Stages with a `variant` argument are also
+summed up per variant.
+'''
+import contextlib
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+
+_active = None
+
+
+class Event:
+    __slots__ = ('name', 'args', 'start', 'end', 'blocks', 'allocated', 'peak')
+
+    def __init__(self, name, args, start):
+        self.name = name
+        self.args = args
+        self.start = start
+        self.end = start
+        self.blocks = 0
+        self.allocated = 0
+        self.peak = 0
+
+
+class Profiler:
+    __slots__ = ('events', '_stack', '_origin', '_end')
+
+    def __init__(self):
+        self.events = []
+        self._stack = []
+        self._origin = self._end = time.perf_counter_ns()
+
+    # tracemalloc is imported only when profiling, to keep importing this module cheap.
+
+    def start(self):
+        global _active
+        import tracemalloc
+        tracemalloc.start()
+        self._origin = time.perf_counter_ns()
+        _active = self
+
+    def stop(self):
+        global _active
+        import tracemalloc
+        self._end = time.perf_counter_ns()
+        _active = None
+        tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def stage(self, name, args):
+        import tracemalloc
+        parent = self._stack[-1] if self._stack else None
+        if parent is not None:
+            # The peak is reset for this stage, so keep what the parent reached until now.
+            parent.peak = max(parent.peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        event = Event(name, args, time.perf_counter_ns())
+        start_memory = tracemalloc.get_traced_memory()[0]
+        start_blocks = sys.getallocatedblocks()
+        self._stack.append(event)
+        try:
+            yield
+        finally:
+            event.end = time.perf_counter_ns()
+            self._stack.pop()
+            current, peak = tracemalloc.get_traced_memory()
+            event.blocks = sys.getallocatedblocks() - start_blocks
+            event.allocated = current - start_memory
+            event.peak = max(event.peak, peak) - start_memory
+            if parent is not None:
+                parent.peak = max(parent.peak, start_memory + event.peak)
+            self.events.append(event)
+
+    def get_trace(self):
+        '''Get the events in the Chrome trace event format, for chrome://tracing or Perfetto.'''
+        pid = os.getpid()
+        trace_events = []
+        for event in sorted(self.events, key=lambda event: event.start):
+            trace_events.append({
+                'name': event.name,
+                'cat': 'build',
+                'ph': 'X',
+                'ts': (event.start - self._origin) / 1000,
+                'dur': (event.end - event.start) / 1000,
+                'pid': pid,
+                'tid': 0,
+                'args': {
+                    **event.args,
+                    'blocks': event.blocks,
+                    'allocated_bytes': event.allocated,
+                    'peak_bytes': event.peak
+                }
+            })
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    def get_summary(self):
+        lines = [f'Total: {(self._end - self._origin) / 1e6:.2f} ms', '']
+
+        def table(title, groups):
+            width = max(len(title), *map(len, groups))
+            lines.append(f'{title:<{width}} {"count":>5} {"total ms":>9} {"mean ms":>8} '
+                         f'{"blocks":>8} {"alloc KiB":>9} {"peak KiB":>9}')
+            for key, events in groups.items():
+                total = sum(event.end - event.start for event in events) / 1e6
+                lines.append(
+                    f'{key:<{width}} {len(events):>5} {total:>9.2f} {total / len(events):>8.3f} '
+                    f'{sum(event.blocks for event in events):>8} '
+                    f'{sum(event.allocated for event in events) / 1024:>9.1f} '
+                    f'{max(event.peak for event in events) / 1024:>9.1f}'
+                )
+            lines.append('')
+
+        by_stage = defaultdict(list)
+        by_variant = defaultdict(list)
+        for event in self.events:
+            by_stage[event.name].append(event)
+            if 'variant' in event.args:
+                by_variant[event.args['variant']].append(event)
+
+        table('Stage (including nested stages)', by_stage)
+        if by_variant:
+            table('Variant (sum of its stages)', by_variant)
+        return '\n'.join(lines)
+
+    def write(self, trace_path):
+        '''Write the trace, and the summary next to it as a .txt file. Returns the summary.'''
+        summary = self.get_summary()
+        with open(trace_path, 'w') as f:
+            json.dump(self.get_trace(), f)
+        with open(f'{os.path.splitext(trace_path)[0]}.txt', 'w') as f:
+            f.write(summary)
+        return summary
+
+
+@contextlib.contextmanager
+def stage(name, **args):
+    '''Record a stage of the build with the active profiler, if there is one.'''
+    if _active is None:
+        yield
+        return
+    with _active.stage(name, args):
+        yield
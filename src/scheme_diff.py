@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+'''Show what an update of the Adwaita style schemes would change in the themes.
+
+    python3 scheme_diff.py NEW                 # compare gtksourceview_xml to NEW
+    python3 scheme_diff.py OLD NEW [NEWER...]  # compare each version to the next
+
+A version is a directory with Adwaita.xml and Adwaita-dark.xml, a base URL to download them
+from (like the one `gtksourceview_xml/update.sh` uses), or a single scheme file, whose theme
+type is guessed from its name.
+
+For each pair of versions this lists the added, removed and recolored named colors and the
+changed <style> attributes, then maps them through MAP and `get_adwaita_ui_colors` to the
+tokenColors rules and UI keys that change, and the variants that need to be rebuilt. Each
+version is parsed once, however many pairs it's part of.
+'''
+import argparse
+import functools
+import json
+import os
+import sys
+import tempfile
+import urllib.request
+from adwaita_colors import MAP, SCHEMES_DIR, load_scheme
+from adwaita_ui_colors import ACCENT_COLORS, get_adwaita_ui_colors
+from variants import get_variants
+
+
+SCHEME_FILES = {'light': 'Adwaita.xml', 'dark': 'Adwaita-dark.xml'}
+
+# The style fields that end up in tokenColors.
+TEXTMATE_FIELDS = ('foreground', 'bold', 'italic', 'strikethrough')
+
+
+def resolve_version(version, download_dir):
+    '''Get the scheme paths of a version, keyed by theme type.'''
+    if version.startswith(('http://', 'https://')):
+        target_dir = tempfile.mkdtemp(dir=download_dir)
+        paths = {}
+        for theme_type, file_name in SCHEME_FILES.items():
+            paths[theme_type] = os.path.join(target_dir, file_name)
+            urllib.request.urlretrieve(f'{version.rstrip("/")}/{file_name}', paths[theme_type])
+        return paths
+    if os.path.isdir(version):
+        return {
+            theme_type: os.path.join(version, file_name)
+            for theme_type, file_name in SCHEME_FILES.items()
+            if os.path.exists(os.path.join(version, file_name))
+        }
+    theme_type = 'dark' if 'dark' in os.path.basename(version).lower() else 'light'
+    return {theme_type: version}
+
+
+@functools.cache
+def load_style_attributes(path):
+    '''Get the attributes of each <style> as written, with named colors unresolved.'''
+    from xml.etree.ElementTree import parse as parse_xml
+    return {
+        style_elem.get('name'): dict(style_elem.attrib)
+        for style_elem in parse_xml(path).iterfind('style')
+    }
+
+
+def diff_mappings(old, new):
+    '''Get (key, old value, new value) for every key that differs. Missing values are None.'''
+    return [
+        (key, old.get(key), new.get(key))
+        for key in sorted(old.keys() | new.keys())
+        if old.get(key) != new.get(key)
+    ]
+
+
+def diff_scheme(old_path, new_path):
+    '''Get the semantic differences between two versions of a scheme.'''
+    old_scheme, new_scheme = load_scheme(old_path), load_scheme(new_path)
+    old_styles, new_styles = load_style_attributes(old_path), load_style_attributes(new_path)
+    style_changes = {}
+    for name, old, new in diff_mappings(old_styles, new_styles):
+        # The attributes that changed, or whether the whole style was added or removed.
+        if old is None or new is None:
+            style_changes[name] = 'added' if old is None else 'removed'
+        else:
+            style_changes[name] = diff_mappings(
+                {key: value for key, value in old.items() if key != 'name'},
+                {key: value for key, value in new.items() if key != 'name'}
+            )
+
+    # Styles that look different once named colors are resolved, which includes styles that
+    # didn't change themselves but use a recolored named color.
+    def effective(scheme, name):
+        style = scheme.styles.get(name)
+        return None if style is None else tuple(getattr(style, field) for field in TEXTMATE_FIELDS)
+
+    restyled = sorted(
+        name for name in old_scheme.styles.keys() | new_scheme.styles.keys()
+        if effective(old_scheme, name) != effective(new_scheme, name)
+    )
+    return {
+        'named_colors': diff_mappings(old_scheme.named_colors, new_scheme.named_colors),
+        'styles': style_changes,
+        'restyled': restyled
+    }
+
+
+def get_ui_changes(old_path, new_path, accents):
+    '''Get the changed UI keys of each combination of UI parameters.
+
+    The UI of both theme types is derived from the palette of the light scheme.
+    '''
+    old_colors = load_scheme(old_path).named_colors
+    new_colors = load_scheme(new_path).named_colors
+    if old_colors == new_colors:
+        return {}
+    changes = {}
+    for variant in get_variants(selected={'accent': accents, 'syntax': ('adwaita',)}):
+        params = variant.params
+        ui_params = (params['theme_type'], params['colorful_status_bar'], params['accent'])
+        changed = diff_mappings(get_adwaita_ui_colors(*ui_params, named_colors=old_colors),
+                                get_adwaita_ui_colors(*ui_params, named_colors=new_colors))
+        if changed:
+            changes[ui_params] = changed
+    return changes
+
+
+def analyze(old_paths, new_paths, accents):
+    '''Diff two versions and get the rules, UI keys and variants that change.'''
+    result = {'schemes': {}, 'rules': {}, 'ui': {}, 'variants': []}
+    for theme_type in SCHEME_FILES:
+        if theme_type not in old_paths or theme_type not in new_paths:
+            continue
+        diff = diff_scheme(old_paths[theme_type], new_paths[theme_type])
+        result['schemes'][theme_type] = diff
+        result['rules'][theme_type] = {
+            name: MAP[name] for name in diff['restyled'] if name in MAP
+        }
+
+    if 'light' in old_paths and 'light' in new_paths:
+        result['ui'] = get_ui_changes(old_paths['light'], new_paths['light'], accents)
+
+    for variant in get_variants(selected={'accent': accents}):
+        params = variant.params
+        ui_params = (params['theme_type'], params['colorful_status_bar'], params['accent'])
+        if ui_params in result['ui'] or \
+                params['syntax'] == 'adwaita' and result['rules'].get(params['theme_type']):
+            result['variants'].append(variant.file_name)
+    return result
+
+
+def format_value(value):
+    return '-' if value is None else str(value)
+
+
+def print_result(result, variant_count):
+    for theme_type, diff in result['schemes'].items():
+        print(f'{SCHEME_FILES[theme_type]}:')
+        if not diff['named_colors'] and not diff['styles']:
+            print('  no changes')
+        for name, old, new in diff['named_colors']:
+            mark = '+' if old is None else '-' if new is None else '~'
+            print(f'  {mark} color {name}: {format_value(old)} -> {format_value(new)}')
+        for name, attributes in sorted(diff['styles'].items()):
+            if isinstance(attributes, str):
+                print(f'  {"+" if attributes == "added" else "-"} style {name}')
+                continue
+            changes = ', '.join(f'{attribute} {format_value(old)} -> {format_value(new)}'
+                                for attribute, old, new in attributes)
+            print(f'  ~ style {name}: {changes}')
+
+    print('\ntokenColors rules that change:')
+    rules = [(theme_type, name, scopes) for theme_type, by_name in result['rules'].items()
+             for name, scopes in by_name.items()]
+    for theme_type, name, scopes in rules:
+        print(f'  {theme_type}: {name} ({len(scopes)} selector(s))')
+    if not rules:
+        print('  none')
+
+    print('\nUI keys that change:')
+    for (theme_type, colorful_status_bar, accent), changes in result['ui'].items():
+        status_bar = ', colorful status bar' if colorful_status_bar else ''
+        print(f'  {theme_type}, {accent} accent{status_bar}: '
+              + ', '.join(key for key, _old, _new in changes))
+    if not result['ui']:
+        print('  none')
+
+    print(f'\nVariants to rebuild: {len(result["variants"])} of {variant_count}')
+    for file_name in result['variants']:
+        print(f'  {file_name}')
+
+
+def to_json(result):
+    return {
+        'schemes': result['schemes'],
+        'rules': result['rules'],
+        'ui': [
+            {
+                'theme_type': theme_type,
+                'colorful_status_bar': colorful_status_bar,
+                'accent': accent,
+                'keys': {key: [old, new] for key, old, new in changes}
+            }
+            for (theme_type, colorful_status_bar, accent), changes in result['ui'].items()
+        ],
+        'variants': result['variants']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Show what an update of the Adwaita style schemes would change.'
+    )
+    parser.add_argument('versions', nargs='+', metavar='VERSION',
+                        help='scheme directories, base URLs or files, oldest first; a single '
+                             'version is compared to the current schemes')
+    parser.add_argument('--accents', nargs='+', choices=[*ACCENT_COLORS, 'all'], default=['blue'],
+                        help='accent colors to consider variants of (default: blue)')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+    accents = tuple(ACCENT_COLORS) if 'all' in args.accents else args.accents
+
+    versions = args.versions
+    if len(versions) == 1:
+        versions = [SCHEMES_DIR, *versions]
+    variant_count = len(list(get_variants(selected={'accent': accents})))
+
+    results = []
+    with tempfile.TemporaryDirectory() as download_dir:
+        paths = [resolve_version(version, download_dir) for version in versions]
+        for (old, old_paths), (new, new_paths) in zip(zip(versions, paths),
+                                                     zip(versions[1:], paths[1:])):
+            result = analyze(old_paths, new_paths, accents)
+            results.append((old, new, result))
+            if not args.json:
+                print(f'=== {old} -> {new}\n')
+                print_result(result, variant_count)
+                print()
+
+    if args.json:
+        json.dump([{'old': old, 'new': new, **to_json(result)} for old, new, result in results],
+                  sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+'''Resolve which tokenColors rule applies to a TextMate scope stack, like VS Code does.
+
+This mirrors the theme trie in vscode-textmate (src/theme.ts): rules are indexed by the
+dot-separated segments of the last scope in their selector, and parent scopes in a selector
+("source.js storage.type") are matched against the rest of the scope stack. Settings that a
+matching rule doesn't set are inherited from the enclosing scopes, like in the editor.
+
+Usage: scopes.py THEME.json < stacks.txt, with one space-separated scope stack per line,
+outermost first. Prints the resolved foreground and font style of each stack.
+'''
+import argparse
+import json
+import sys
+
+
+# A font style or foreground that isn't set by a rule, as opposed to fontStyle "".
+NOT_SET = None
+
+# Entries each cache of a ScopeResolver holds before it's cleared.
+CACHE_SIZE = 1 << 16
+
+
+def parse_font_style(font_style):
+    if font_style is None:
+        return NOT_SET
+    styles = font_style.split()
+    return ' '.join(
+        style for style in ('italic', 'bold', 'underline', 'strikethrough') if style in styles
+    )
+
+
+def parse_foreground(foreground):
+    if isinstance(foreground, str) and foreground.startswith('#') \
+            and len(foreground) in (4, 5, 7, 9):
+        return foreground.lower()
+    return NOT_SET
+
+
+def iter_selectors(scope):
+    '''Split a rule's `scope` (a list or a comma-separated string) into selectors.'''
+    if isinstance(scope, str):
+        scope = scope.split(',')
+    elif scope is None:
+        scope = ['']
+    for selector in scope:
+        yield selector.strip()
+
+
+def scope_matches(scope, selector):
+    return scope == selector or (scope.startswith(selector) and scope[len(selector)] == '.')
+
+
+class Rule:
+    '''Settings for one selector, with parent scopes stored innermost first.'''
+    __slots__ = ('depth', 'parent_scopes', 'font_style', 'foreground')
+
+    def __init__(self, depth, parent_scopes, font_style, foreground):
+        self.depth = depth
+        self.parent_scopes = parent_scopes
+        self.font_style = font_style
+        self.foreground = foreground
+
+    def clone(self):
+        return Rule(self.depth, self.parent_scopes, self.font_style, self.foreground)
+
+    def overwrite(self, depth, font_style, foreground):
+        self.depth = max(self.depth, depth)
+        if font_style is not NOT_SET:
+            self.font_style = font_style
+        if foreground is not NOT_SET:
+            self.foreground = foreground
+
+    def matches_parents(self, parents):
+        '''Check whether parent scopes (innermost first) satisfy this rule's parent selectors.'''
+        if not self.parent_scopes:
+            return True
+        index = 0
+        for scope in parents:
+            if scope_matches(scope, self.parent_scopes[index]):
+                index += 1
+                if index == len(self.parent_scopes):
+                    return True
+        return False
+
+    def specificity(self):
+        # Deeper scope matches first, then longer parent selectors, then more of them. The
+        # trailing 0 sorts a selector after longer ones it's a prefix of.
+        return -self.depth, (*(-len(scope) for scope in self.parent_scopes), 0)
+
+
+class TrieNode:
+    '''A node of the scope segment trie. Children inherit their parent's rules when created.'''
+    __slots__ = ('main_rule', 'parent_rules', 'children')
+
+    def __init__(self, main_rule, parent_rules):
+        self.main_rule = main_rule
+        self.parent_rules = parent_rules
+        self.children = {}
+
+    def insert(self, depth, segments, parent_scopes, font_style, foreground):
+        node = self
+        for segment in segments:
+            child = node.children.get(segment)
+            if child is None:
+                child = TrieNode(
+                    node.main_rule.clone(), [rule.clone() for rule in node.parent_rules]
+                )
+                node.children[segment] = child
+            node = child
+            depth += 1
+        node.insert_here(depth, parent_scopes, font_style, foreground)
+
+    def insert_here(self, depth, parent_scopes, font_style, foreground):
+        if not parent_scopes:
+            self.main_rule.overwrite(depth, font_style, foreground)
+            return
+        for rule in self.parent_rules:
+            if rule.parent_scopes == parent_scopes:
+                rule.overwrite(depth, font_style, foreground)
+                return
+        # Unset settings fall back to what applies to the scope regardless of its parents.
+        if font_style is NOT_SET:
+            font_style = self.main_rule.font_style
+        if foreground is NOT_SET:
+            foreground = self.main_rule.foreground
+        self.parent_rules.append(Rule(depth, parent_scopes, font_style, foreground))
+
+    def match(self, scope):
+        '''Get candidate rules for a scope, most specific first.'''
+        node = self
+        for segment in scope.split('.'):
+            child = node.children.get(segment)
+            if child is None:
+                break
+            node = child
+        return sorted([node.main_rule, *node.parent_rules], key=Rule.specificity)
+
+
+class ScopeResolver:
+    '''Resolves the foreground and font style for scope stacks from a theme's tokenColors.
+
+    Matches per scope and results per stack, including every prefix of the stacks resolved,
+    are cached. Each cache is cleared once it holds `cache_size` entries, which bounds the
+    memory used when resolving millions of distinct stacks to about 10 MB.
+    '''
+
+    def __init__(self, token_colors, cache_size=CACHE_SIZE):
+        parsed = []
+        for index, rule in enumerate(token_colors):
+            settings = rule.get('settings') or {}
+            font_style = parse_font_style(settings.get('fontStyle'))
+            foreground = parse_foreground(settings.get('foreground'))
+            for selector in iter_selectors(rule.get('scope')):
+                *parents, scope = selector.split() or ['']
+                parent_scopes = tuple(reversed(parents))
+                parsed.append((scope, parent_scopes, index, font_style, foreground))
+
+        # Insert rules in the same order as vscode-textmate, so that parents are in the trie
+        # before their children copy them and later rules override earlier ones.
+        parsed.sort(key=lambda rule: (rule[0], rule[1], rule[2]))
+
+        # Leading rules with an empty selector set the defaults.
+        self.default_font_style = ''
+        self.default_foreground = NOT_SET
+        while parsed and parsed[0][0] == '' and not parsed[0][1]:
+            _scope, _parents, _index, font_style, foreground = parsed.pop(0)
+            if font_style is not NOT_SET:
+                self.default_font_style = font_style
+            if foreground is not NOT_SET:
+                self.default_foreground = foreground
+
+        self.root = TrieNode(Rule(0, (), NOT_SET, NOT_SET), [])
+        for scope, parent_scopes, _index, font_style, foreground in parsed:
+            segments = scope.split('.') if scope else []
+            self.root.insert(0, segments, parent_scopes, font_style, foreground)
+
+        self._cache_size = cache_size
+        self._match_cache = {}
+        self._resolve_cache = {}
+
+    @classmethod
+    def from_theme_file(cls, path):
+        with open(path) as f:
+            return cls(json.load(f).get('tokenColors', []))
+
+    def match(self, scope, parents):
+        '''Get the rule for the innermost `scope` given its `parents` (innermost first).'''
+        candidates = self._match_cache.get(scope)
+        if candidates is None:
+            if len(self._match_cache) >= self._cache_size:
+                self._match_cache.clear()
+            candidates = self._match_cache[scope] = self.root.match(scope)
+        for rule in candidates:
+            if rule.matches_parents(parents):
+                return rule
+        return None
+
+    def resolve(self, stack):
+        '''Get (foreground, font style) for a scope stack, given outermost first.'''
+        stack = tuple(stack)
+        result = self._resolve_cache.get(stack)
+        if result is not None:
+            return result
+
+        if stack:
+            # Settings of the enclosing scopes are inherited, so resolve the parent stack first.
+            foreground, font_style = self.resolve(stack[:-1])
+            rule = self.match(stack[-1], stack[-2::-1])
+            if rule is not None:
+                if rule.foreground is not NOT_SET:
+                    foreground = rule.foreground
+                if rule.font_style is not NOT_SET:
+                    font_style = rule.font_style
+            result = foreground, font_style
+        else:
+            result = self.default_foreground, self.default_font_style
+
+        if len(self._resolve_cache) >= self._cache_size:
+            self._resolve_cache.clear()
+        self._resolve_cache[stack] = result
+        return result
+
+
+def is_shadowed(selector, settings, resolver, last_scopes, parent_last_scopes):
+    '''Check whether a selector only restates the settings that apply without it.
+
+    That's the case for a selector without parent scopes, like "constant.numeric.float", if
+    the rule that matches without it, here that of "constant.numeric", sets the same values.
+    No other selector may end in a scope within it, and no selector with parent scopes may end
+    in one it's within, as those would tell the two apart.
+    '''
+    parent_scope = selector.rpartition('.')[0]
+    if not parent_scope or ' ' in selector or not settings \
+            or not settings.keys() <= {'foreground', 'fontStyle'}:
+        return False
+    if any(scope != selector and scope_matches(scope, selector) for scope in last_scopes) \
+            or any(scope_matches(selector, scope) for scope in parent_last_scopes):
+        return False
+    rule = resolver.match(parent_scope, ())
+    foreground = parse_foreground(settings.get('foreground'))
+    font_style = parse_font_style(settings.get('fontStyle'))
+    return ('foreground' not in settings
+            or foreground is not NOT_SET and foreground == rule.foreground) \
+        and ('fontStyle' not in settings or font_style == rule.font_style)
+
+
+def compact_token_colors(token_colors):
+    '''Get equivalent tokenColors with as few rules and settings as possible.
+
+    Rules with the same selector are merged into one, later settings overriding earlier ones,
+    which is what VS Code does as well. Selectors that are shadowed by a less specific one with
+    the same settings (see `is_shadowed`) and settings that can't change anything are dropped,
+    and selectors with identical settings are then grouped into a single rule. As each selector
+    occurs only once afterwards, the order of rules no longer matters.
+    '''
+    settings_by_selector = {}
+    for rule in token_colors:
+        settings = rule.get('settings') or {}
+        for selector in iter_selectors(rule.get('scope')):
+            selector = ' '.join(selector.split())
+            settings_by_selector.setdefault(selector, {}).update(settings)
+
+    resolver = ScopeResolver([
+        {'scope': [selector], 'settings': settings}
+        for selector, settings in settings_by_selector.items()
+    ])
+    last_scopes = {selector.rpartition(' ')[2] for selector in settings_by_selector}
+    parent_last_scopes = {
+        selector.rpartition(' ')[2] for selector in settings_by_selector if ' ' in selector
+    }
+    settings_by_selector = {
+        selector: settings for selector, settings in settings_by_selector.items()
+        if not is_shadowed(selector, settings, resolver, last_scopes, parent_last_scopes)
+    }
+
+    # An empty font style resets italic, bold etc. inherited from enclosing scopes. That's
+    # only needed if a rule sets any, except for the default rule, which has nothing to reset.
+    font_styles_used = any(settings.get('fontStyle') for settings in settings_by_selector.values())
+
+    rules_by_settings = {}
+    for selector, settings in settings_by_selector.items():
+        settings = dict(sorted(settings.items()))
+        if settings.get('fontStyle') == '' and (not font_styles_used or selector == ''):
+            del settings['fontStyle']
+        if not settings:
+            continue
+        key = json.dumps(settings, sort_keys=True)
+        rules_by_settings.setdefault(key, {'scope': [], 'settings': settings})['scope'].append(selector)
+
+    return list(rules_by_settings.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Resolve the foreground and font style of scope stacks in a theme.'
+    )
+    parser.add_argument('theme', help='path to a color theme JSON file')
+    args = parser.parse_args()
+
+    resolver = ScopeResolver.from_theme_file(args.theme)
+    write = sys.stdout.write
+    for line in sys.stdin:
+        stack = line.split()
+        foreground, font_style = resolver.resolve(stack)
+        write(f'{foreground or "-"}\t{font_style or "-"}\t{" ".join(stack)}\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+'''Serve generated themes over HTTP, on a TCP port or a Unix socket.
+
+    GET /theme?theme_type=dark&accent=teal&syntax=adwaita&colorful_status_bar=true
+    GET /metrics
+
+Parameters that are left out take the values of the published theme (dark, blue accent, adwaita
+syntax, no colorful status bar). Schemes and UI color tables are loaded once at startup, and
+generated themes are kept in an LRU cache keyed on the normalized parameters.
+'''
+import argparse
+import json
+import os
+import socketserver
+import stat
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from adwaita_theme import get_theme, get_token_colors
+from adwaita_ui_colors import get_accent_shades, get_adwaita_ui_colors, get_default_ui_colors
+from variants import AXES, Variant
+
+
+DEFAULTS = {
+    'theme_type': 'dark',
+    'accent': 'blue',
+    'syntax': 'adwaita',
+    'colorful_status_bar': False
+}
+
+BOOLEANS = {
+    'true': True, '1': True, 'yes': True, 'on': True,
+    'false': False, '0': False, 'no': False, 'off': False
+}
+
+
+def normalize_params(query):
+    '''Get the full, validated parameters of a variant from a query string.
+
+    Raises ValueError for unknown parameters and values.
+    '''
+    values = parse_qs(query, keep_blank_values=True)
+    unknown = values.keys() - DEFAULTS.keys()
+    if unknown:
+        raise ValueError(f'unknown parameter: {sorted(unknown)[0]}')
+
+    params = dict(DEFAULTS)
+    for axis in AXES:
+        if axis.name not in values:
+            continue
+        value = values[axis.name][-1].strip().lower()
+        if isinstance(DEFAULTS[axis.name], bool):
+            if value not in BOOLEANS:
+                raise ValueError(f'invalid {axis.name}: {value!r}')
+            value = BOOLEANS[value]
+        if value not in axis.values:
+            raise ValueError(f'invalid {axis.name}: {value!r}')
+        params[axis.name] = value
+    return params
+
+
+def generate(params):
+    '''Get a theme as minified JSON, like `build.py` writes it.'''
+    # Unlike adwaita_theme.build_theme, this doesn't copy the cached tokenColors, as the theme
+    # is serialized right away and never modified.
+    theme = get_theme(
+        Variant(params),
+        get_adwaita_ui_colors(params['theme_type'], params['colorful_status_bar'], params['accent']),
+        get_token_colors(params['theme_type'], params['syntax'])
+    )
+    return json.dumps(theme, sort_keys=True, separators=(',', ':')).encode()
+
+
+def warm_up():
+    '''Parse all inputs up front, so that no request has to.'''
+    for theme_type in AXES[0].values:
+        get_default_ui_colors(theme_type)
+        for syntax in ('adwaita', 'default'):
+            get_token_colors(theme_type, syntax)
+    for accent in AXES[1].values:
+        get_accent_shades(accent)
+
+
+class LRUCache:
+    '''A thread-safe mapping that drops the least recently used entries beyond `capacity`.'''
+    __slots__ = ('capacity', 'evictions', '_entries', '_lock')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+
+class Metrics:
+    '''Counts and latencies of requests by outcome, with percentiles of the most recent ones.'''
+    __slots__ = ('counts', 'latencies', 'total_latency', '_window', '_lock')
+
+    def __init__(self, window=10000):
+        self.counts = {}
+        self.latencies = {}
+        self.total_latency = {}
+        self._lock = threading.Lock()
+        self._window = window
+
+    def record(self, outcome, latency):
+        with self._lock:
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+            self.total_latency[outcome] = self.total_latency.get(outcome, 0) + latency
+            self.latencies.setdefault(outcome, deque(maxlen=self._window)).append(latency)
+
+    def summary(self):
+        with self._lock:
+            result = {}
+            for outcome, count in self.counts.items():
+                recent = sorted(self.latencies[outcome])
+                result[outcome] = {
+                    'count': count,
+                    'mean_ms': self.total_latency[outcome] / count * 1000,
+                    'p50_ms': recent[len(recent) // 2] * 1000,
+                    'p99_ms': recent[min(len(recent) * 99 // 100, len(recent) - 1)] * 1000,
+                    'max_ms': recent[-1] * 1000
+                }
+            return result
+
+
+class ThemeRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'AdwaitaThemes'
+
+    def do_GET(self):
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        if url.path == '/theme':
+            outcome = self.send_theme(url.query)
+        elif url.path == '/metrics':
+            outcome = 'metrics'
+            self.send_json(200, self.get_metrics())
+        else:
+            outcome = 'error'
+            self.send_json(404, {'error': f'not found: {url.path}'})
+        self.server.metrics.record(outcome, time.perf_counter() - start)
+
+    def send_theme(self, query):
+        try:
+            params = normalize_params(query)
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+            return 'error'
+
+        key = tuple(params[axis.name] for axis in AXES)
+        body = self.server.cache.get(key)
+        outcome = 'hit'
+        if body is None:
+            body = generate(params)
+            self.server.cache.put(key, body)
+            outcome = 'miss'
+        self.send_body(200, body)
+        return outcome
+
+    def get_metrics(self):
+        cache = self.server.cache
+        latencies = self.server.metrics.summary()
+        hits = latencies.get('hit', {}).get('count', 0)
+        misses = latencies.get('miss', {}).get('count', 0)
+        return {
+            'cache': {
+                'size': len(cache),
+                'capacity': cache.capacity,
+                'hits': hits,
+                'misses': misses,
+                'evictions': cache.evictions,
+                'hit_rate': hits / (hits + misses) if hits + misses else None
+            },
+            'latency': latencies
+        }
+
+    def send_json(self, status, value):
+        self.send_body(status, json.dumps(value, indent=2).encode())
+
+    def send_body(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Clients of a Unix socket have no address.
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class ThemeServerMixin:
+    def setup_themes(self, cache_size, quiet):
+        self.cache = LRUCache(cache_size)
+        self.metrics = Metrics()
+        self.quiet = quiet
+
+
+class TCPThemeServer(ThemeServerMixin, ThreadingHTTPServer):
+    pass
+
+
+class UnixThemeServer(ThemeServerMixin, socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve generated themes over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000, help='port to listen on (default: 8000)')
+    parser.add_argument('--unix', metavar='PATH', help='listen on a Unix socket instead of a port')
+    parser.add_argument('--cache-size', type=int, default=256,
+                        help='number of generated themes to keep (default: 256)')
+    parser.add_argument('--quiet', action='store_true', help="don't log requests")
+    args = parser.parse_args()
+
+    if args.unix:
+        # Replace the socket of an earlier run, but nothing else that's in the way.
+        try:
+            if not stat.S_ISSOCK(os.stat(args.unix).st_mode):
+                parser.error(f'{args.unix} exists and is not a socket')
+            os.unlink(args.unix)
+        except FileNotFoundError:
+            pass
+
+    warm_up()
+
+    if args.unix:
+        server = UnixThemeServer(args.unix, ThemeRequestHandler)
+        address = args.unix
+    else:
+        server = TCPThemeServer((args.host, args.port), ThemeRequestHandler)
+        address = f'http://{args.host}:{server.server_port}'
+    server.setup_themes(args.cache_size, args.quiet)
+
+    print(f'Serving themes on {address}, press Ctrl+C to stop.')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.unix:
+            os.unlink(args.unix)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+'''An intermediate representation of the themes, for generating them in formats besides VS Code's.
+
+A `SchemeIR` holds what's derived from a style scheme: its palette of named colors, its styles
+as written, and the TextMate rules MAP makes of them. A `VariantIR` adds the UI colors of an
+accent and status bar, and roles like the background and the terminal colors that other
+formats need.
+
+    import theme_ir
+    for variant in theme_ir.get_variant_irs(accents=('blue', 'teal')):
+        print(variant.name, variant.roles['background'])
+
+The IR is cached in `.ir-cache.pickle`, keyed on hashes of everything it's built from, so that
+later runs don't parse schemes or derive colors at all.
+'''
+import os
+import pickle
+from adwaita_colors import MAP, Scheme, get_adwaita_scheme_path, gsv_to_textmate
+from adwaita_theme import get_default_syntax_colors_path
+from adwaita_ui_colors import derive_accent_shades, get_adwaita_ui_colors
+from build import hash_file, hash_json, write_if_changed
+from profiling import stage
+from variants import AXES, Variant
+
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.path.join(SRC_DIR, '.ir-cache.pickle')
+
+# Modules whose code the IR depends on, besides the schemes, the default themes and MAP.
+SOURCES = (
+    'adwaita_colors.py', 'adwaita_ui_colors.py', 'color_math.py', 'jsonc.py', 'nearest_colors.py',
+    'theme_ir.py', 'variants.py'
+)
+
+# Bump this whenever the classes below change, so that older caches aren't unpickled into them.
+IR_VERSION = 2
+
+# Named colors of the 16 terminal colors, black to white and then their bright versions. They
+# follow the palette of GNOME Console, rounded to the nearest named color.
+TERMINAL_COLORS = (
+    'dark_5', 'red_4', 'green_4', 'yellow_4', 'blue_4', 'purple_3', 'teal_3', 'light_5',
+    'dark_2', 'red_2', 'green_2', 'yellow_2', 'blue_2', 'purple_2', 'teal_2', 'light_3'
+)
+
+
+class SchemeStyle:
+    '''A <style> of a scheme as written, with colors naming a palette entry or literal.'''
+    __slots__ = ('name', 'attributes')
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+
+
+class SyntaxRule:
+    '''A TextMate rule that `gsv_to_textmate` makes of a scheme style, with the style's name.'''
+    __slots__ = ('style', 'scopes', 'settings')
+
+    def __init__(self, style, scopes, settings):
+        self.style = style
+        self.scopes = scopes
+        self.settings = settings
+
+    def to_textmate(self):
+        return {'scope': list(self.scopes), 'settings': dict(self.settings)}
+
+
+class SchemeIR:
+    '''Everything derived from a style scheme, shared by the variants of its theme type.'''
+    __slots__ = ('theme_type', 'attributes', 'metadata', 'palette', 'styles', 'rules', 'resolved')
+
+    def __init__(self, theme_type, attributes, metadata, palette, styles, rules, resolved):
+        self.theme_type = theme_type
+        # Attributes of <style-scheme>, and the other elements before the colors, like <author>.
+        self.attributes = attributes
+        self.metadata = metadata
+        self.palette = palette
+        self.styles = styles
+        self.rules = rules
+        # The resolved global styles, like "text" and "current-line", by name.
+        self.resolved = resolved
+
+
+class VariantIR:
+    '''A theme variant: its scheme, plus the UI colors and roles of an accent and status bar.'''
+    __slots__ = ('scheme', 'params', 'name', 'ui_colors', 'roles')
+
+    def __init__(self, scheme, params, name, ui_colors, roles):
+        self.scheme = scheme
+        # The parameters of the VS Code variant with Adwaita syntax highlighting.
+        self.params = params
+        self.name = name
+        self.ui_colors = ui_colors
+        self.roles = roles
+
+
+def build_scheme_ir(theme_type):
+    '''Parse the scheme of a theme type into a SchemeIR.'''
+    from xml.etree.ElementTree import parse as parse_xml
+    path = get_adwaita_scheme_path(theme_type)
+    with stage('xml parse', path=path):
+        tree = parse_xml(path)
+    root = tree.getroot()
+    # Parsed once, for both the styles as written and the resolved ones.
+    scheme = Scheme.from_tree(tree, path)
+
+    metadata = []
+    for element in root:
+        if element.tag in ('color', 'style'):
+            break
+        if element.tag == 'metadata':
+            metadata.append(('metadata', [(prop.get('name'), prop.text) for prop in element]))
+        else:
+            metadata.append((element.tag, element.text))
+
+    styles = [
+        SchemeStyle(element.get('name'),
+                    {key: value for key, value in element.attrib.items() if key != 'name'})
+        for element in root.iterfind('style')
+    ]
+
+    with stage('gsv_to_textmate', theme_type=theme_type):
+        textmate_rules = gsv_to_textmate(scheme)
+    # gsv_to_textmate makes a rule of each style in MAP that's in the scheme, in order.
+    style_names = [name for name in MAP if name in scheme.styles]
+    rules = [
+        SyntaxRule(name, rule['scope'], rule['settings'])
+        for name, rule in zip(style_names, textmate_rules)
+    ]
+
+    resolved = {
+        name: {'foreground': style.foreground, 'background': style.background}
+        for name, style in scheme.styles.items() if ':' not in name
+    }
+    return SchemeIR(theme_type, dict(root.attrib), metadata, scheme.named_colors, styles, rules,
+                    resolved)
+
+
+def get_roles(scheme, ui_colors, accent_shades, palette):
+    '''Get the colors of a variant by what they're for, as formats other than VS Code need.'''
+    return {
+        'background': ui_colors['editor.background'],
+        'foreground': scheme.resolved['text']['foreground'],
+        'accent': accent_shades[3],
+        'accent_foreground': '#ffffff',
+        'border': ui_colors['editorGroup.border'],
+        'cursor': (scheme.resolved.get('cursor') or scheme.resolved['text'])['foreground'],
+        'selection_background': ui_colors['list.activeSelectionBackground'],
+        'selection_foreground': ui_colors['list.activeSelectionForeground'],
+        'current_line': scheme.resolved['current-line']['background'],
+        'line_number': ui_colors['editorLineNumber.foreground'],
+        'terminal': [palette[name] for name in TERMINAL_COLORS]
+    }
+
+
+def build_variant_irs(accents):
+    schemes = {theme_type: build_scheme_ir(theme_type) for theme_type in AXES[0].values}
+    # The UI of both theme types uses the palette of the light scheme.
+    palette = schemes['light'].palette
+    shades = {accent: derive_accent_shades(accent, palette) for accent in accents}
+
+    variants = []
+    for theme_type, scheme in schemes.items():
+        for accent in accents:
+            for colorful_status_bar in AXES[3].values:
+                params = {
+                    'theme_type': theme_type,
+                    'accent': accent,
+                    'syntax': 'adwaita',
+                    'colorful_status_bar': colorful_status_bar
+                }
+                with stage('ui colors', theme_type=theme_type, accent=accent):
+                    ui_colors = get_adwaita_ui_colors(theme_type, colorful_status_bar, accent,
+                                                      named_colors=palette)
+                roles = get_roles(scheme, ui_colors, shades[accent], palette)
+                variants.append(VariantIR(scheme, params, Variant(params).name, ui_colors, roles))
+    return variants
+
+
+def get_cache_key(accents):
+    return hash_json({
+        'version': IR_VERSION,
+        'accents': list(accents),
+        'schemes': [hash_file(get_adwaita_scheme_path(theme_type))
+                    for theme_type in AXES[0].values],
+        'default_themes': [hash_file(get_default_syntax_colors_path(theme_type))
+                           for theme_type in AXES[0].values],
+        'map': hash_json(MAP),
+        'sources': [hash_file(os.path.join(SRC_DIR, name)) for name in SOURCES]
+    })
+
+
+def get_variant_irs(accents=('blue',), use_cache=True):
+    '''Get the IR of every variant with the given accents, from the cache if it's up to date.'''
+    key = get_cache_key(accents)
+    if use_cache:
+        try:
+            with open(CACHE_PATH, 'rb') as f:
+                with stage('ir cache load'):
+                    cached_key, variants = pickle.load(f)
+            if cached_key == key:
+                return variants
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+            pass
+
+    variants = build_variant_irs(accents)
+    if use_cache:
+        # The pickle keeps the schemes shared between variants, so each is stored only once.
+        with stage('ir cache save'):
+            write_if_changed(CACHE_PATH, pickle.dumps((key, variants), pickle.HIGHEST_PROTOCOL))
+    return variants
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+import itertools
+from adwaita_ui_colors import ACCENT_COLORS
+
+
+class Axis:
+    '''A dimension of the theme variant matrix.
+
+    `describe` maps a value to the part it adds to the theme name, or None if it adds nothing.
+    '''
+    __slots__ = ('name', 'values', 'describe')
+
+    def __init__(self, name, values, describe):
+        self.name = name
+        self.values = values
+        self.describe = describe
+
+
+# The first axis is the theme type, which is always part of the name ("Adwaita Dark"). The
+# others are appended as "& something" when they differ from the default look.
+AXES = (
+    Axis('theme_type', ('dark', 'light'), lambda value: value.capitalize()),
+    Axis('accent', tuple(ACCENT_COLORS),
+         lambda value: f'{value} accent' if value != 'blue' else None),
+    Axis('syntax', ('adwaita', 'default'),
+         lambda value: 'default syntax highlighting' if value == 'default' else None),
+    Axis('colorful_status_bar', (False, True),
+         lambda value: 'colorful status bar' if value else None),
+)
+
+
+class Variant:
+    '''A single theme in the variant matrix, with a value for every axis.'''
+    __slots__ = ('params', 'name', 'file_name')
+
+    def __init__(self, params, axes=AXES):
+        self.params = params
+
+        theme_type, *extras = (axis.describe(params[axis.name]) for axis in axes)
+        self.name = f'Adwaita {theme_type}' + ''.join(f' & {extra}' for extra in extras if extra)
+        self.file_name = f'{self.name.lower().replace(" ", "-").replace("-&-", "-")}.json'
+
+    def get_package_json_entry(self):
+        return {
+            'label': self.name,
+            'uiTheme': 'vs-dark' if self.params['theme_type'] == 'dark' else 'vs',
+            'path': f'./themes/{self.file_name}'
+        }
+
+
+def get_variants(axes=AXES, selected=None):
+    '''Get every combination of axis values, in the order they're listed in package.json.
+
+    `selected` optionally maps axis names to the subset of values to use instead of all of them.
+    '''
+    selected = selected or {}
+    names = [axis.name for axis in axes]
+    for values in itertools.product(*(selected.get(axis.name, axis.values) for axis in axes)):
+        yield Variant(dict(zip(names, values)), axes)
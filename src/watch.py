@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+'''Rebuild themes as soon as their inputs change, for `build.py --watch`.
+
+Parsed schemes, default syntax colors and UI colors are kept in memory between rebuilds.
+After a change, only what depends on the changed files is computed again and only the
+affected variants are regenerated. Edited Python modules are reloaded in place. Changes are
+picked up with inotify where available and by polling modification times otherwise.
+'''
+import ctypes
+import ctypes.util
+import importlib
+import os
+import select
+import struct
+import sys
+import time
+import traceback
+import adwaita_colors
+import adwaita_theme
+import adwaita_ui_colors
+import build
+import variants
+
+
+# Generator modules in the order they import each other, so that reloading them in this order
+# leaves no references to the replaced versions behind.
+MODULES = (
+    'profiling', 'color_math', 'nearest_colors', 'jsonc', 'scopes', 'adwaita_colors',
+    'adwaita_ui_colors', 'variants', 'adwaita_theme', 'build'
+)
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Directories with inputs relative to SRC_DIR, and the suffix of the files that are inputs.
+WATCHED = {
+    '.': '.py',
+    'gtksourceview_xml': '.xml',
+    'default_themes': '.jsonc'
+}
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct('iIII')
+
+
+def is_input(path):
+    directory, name = os.path.split(os.path.relpath(path, SRC_DIR))
+    if (directory or '.') == '.':
+        return name in {f'{module}.py' for module in MODULES}
+    return directory in WATCHED and name.endswith(WATCHED[directory])
+
+
+class InotifyWatcher:
+    '''Waits for files to be written or moved into the watched directories, using inotify.'''
+    __slots__ = ('_fd', '_directories')
+
+    def __init__(self, directories):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = libc.inotify_init1(IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._directories = {}
+        for directory in directories:
+            wd = libc.inotify_add_watch(
+                self._fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO
+            )
+            if wd < 0:
+                os.close(self._fd)
+                raise OSError(ctypes.get_errno(), f'cannot watch {directory}')
+            self._directories[wd] = directory
+
+    def _read(self):
+        data = os.read(self._fd, 1 << 16)
+        paths = set()
+        offset = 0
+        while offset < len(data):
+            wd, _mask, _cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if name:
+                paths.add(os.path.normpath(os.path.join(self._directories[wd], name)))
+        return paths
+
+    def wait(self, settle=0.01):
+        '''Block until files change, and get their paths.'''
+        select.select([self._fd], [], [])
+        paths = self._read()
+        # Editors may save in several steps, so pick up whatever follows right after.
+        while select.select([self._fd], [], [], settle)[0]:
+            paths |= self._read()
+        return paths
+
+
+class PollingWatcher:
+    '''Waits for files in the watched directories to change by comparing their mtimes.'''
+    __slots__ = ('_directories', '_interval', '_stats')
+
+    def __init__(self, directories, interval=0.05):
+        self._directories = directories
+        self._interval = interval
+        self._stats = self._scan()
+
+    def _scan(self):
+        stats = {}
+        for directory in self._directories:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        stats[os.path.normpath(entry.path)] = stat.st_mtime_ns, stat.st_size
+        return stats
+
+    def wait(self):
+        while True:
+            time.sleep(self._interval)
+            stats = self._scan()
+            paths = {path for path, stat in stats.items() if self._stats.get(path) != stat}
+            self._stats = stats
+            if paths:
+                return paths
+
+
+def get_watcher(directories):
+    try:
+        return InotifyWatcher(directories), 'inotify'
+    except (OSError, AttributeError):
+        return PollingWatcher(directories), 'polling'
+
+
+def get_syntax_input(theme_type, syntax):
+    '''Get the file that the syntax colors of a theme are generated from.'''
+    if syntax == 'adwaita':
+        return adwaita_colors.get_adwaita_scheme_path(theme_type)
+    return adwaita_theme.get_default_syntax_colors_path(theme_type)
+
+
+class WatchedBuild:
+    '''The inputs of the selected variants, kept in memory and recomputed when they change.
+
+    Syntax colors are cached by (theme type, syntax) and UI colors by file name. Whatever an
+    edited file affects is dropped from the caches, and variants with missing entries rebuilt.
+
+    It starts from the colors of the build that just wrote the themes, computing only those
+    that build skipped, so nothing is regenerated until a file changes.
+    '''
+    __slots__ = ('accents', 'pretty', 'variants', 'syntax_colors', 'ui_colors', 'manifest')
+
+    def __init__(self, accents, pretty, syntax_colors=None, ui_colors=None):
+        self.accents = accents
+        self.pretty = pretty
+        self.syntax_colors = dict(syntax_colors or {})
+        self.ui_colors = dict(ui_colors or {})
+        self.manifest = build.load_manifest()
+        self.select_variants()
+        self.fill()
+
+    def select_variants(self):
+        accents = [accent for accent in self.accents if accent in adwaita_ui_colors.ACCENT_COLORS]
+        self.variants = list(variants.get_variants(selected={'accent': accents}))
+
+    def reload(self):
+        for name in MODULES:
+            importlib.reload(importlib.import_module(name))
+        self.select_variants()
+        self.syntax_colors.clear()
+        self.ui_colors.clear()
+
+    def invalidate(self, paths):
+        if any(path.endswith('.py') for path in paths):
+            self.reload()
+            return
+
+        build.hash_file.cache_clear()
+        if any(path.endswith('.xml') for path in paths):
+            adwaita_colors.load_scheme.cache_clear()
+        for key in list(self.syntax_colors):
+            if get_syntax_input(*key) in paths:
+                del self.syntax_colors[key]
+        # UI colors are made from the palette of the light scheme, and the colors of the
+        # default themes.
+        if adwaita_colors.get_adwaita_scheme_path('light') in paths:
+            adwaita_ui_colors.get_accent_shades.cache_clear()
+            self.ui_colors.clear()
+        if any(path.endswith('.jsonc') for path in paths):
+            adwaita_ui_colors.get_default_ui_colors.cache_clear()
+            adwaita_ui_colors.derive_ui_colors.cache_clear()
+            self.ui_colors.clear()
+
+    def fill(self):
+        '''Compute the inputs that aren't cached, and get the variants that needed them.'''
+        stale = [
+            variant for variant in self.variants
+            if (variant.params['theme_type'], variant.params['syntax']) not in self.syntax_colors
+            or variant.file_name not in self.ui_colors
+        ]
+        for variant in stale:
+            params = variant.params
+            key = params['theme_type'], params['syntax']
+            if key not in self.syntax_colors:
+                self.syntax_colors[key] = build.compact_token_colors(
+                    adwaita_theme.get_syntax_colors(*key)
+                )
+            if variant.file_name not in self.ui_colors:
+                self.ui_colors[variant.file_name] = adwaita_ui_colors.get_adwaita_ui_colors(
+                    params['theme_type'], params['colorful_status_bar'], params['accent']
+                )
+        return stale
+
+    def rebuild(self):
+        '''Regenerate variants whose inputs aren't cached. Returns them and the written ones.'''
+        stale = self.fill()
+        build._init_worker(self.syntax_colors, self.pretty)
+        written = []
+        for variant in stale:
+            params = variant.params
+            ui_colors = self.ui_colors[variant.file_name]
+            changed, output_hash, _previous_size, _size = build.build_variant(variant, ui_colors)
+            inputs = build.get_variant_inputs(params['theme_type'], params['syntax'], ui_colors)
+            inputs['pretty'] = self.pretty
+            self.manifest[variant.file_name] = {'inputs': inputs, 'output': output_hash}
+            if changed:
+                written.append(variant.file_name)
+        if stale:
+            build.save_manifest(self.manifest)
+        return stale, written
+
+
+def watch(accents, pretty=False, syntax_colors=None, ui_colors=None):
+    '''Keep the themes up to date, starting from the colors of the build that just ran.'''
+    directories = [os.path.normpath(os.path.join(SRC_DIR, directory)) for directory in WATCHED]
+    watcher, method = get_watcher(directories)
+    state = WatchedBuild(accents, pretty, syntax_colors, ui_colors)
+    print(f'Watching for changes ({method}), press Ctrl+C to stop.')
+
+    failed = set()
+    try:
+        while True:
+            paths = {path for path in watcher.wait() if is_input(path)}
+            if not paths:
+                continue
+            start = time.perf_counter()
+            try:
+                state.invalidate(paths | failed)
+                stale, written = state.rebuild()
+            except Exception:
+                # Keep watching, and retry these changes along with the next ones, which are
+                # hopefully a fix.
+                traceback.print_exc()
+                failed |= paths
+                continue
+            failed.clear()
+            elapsed = (time.perf_counter() - start) * 1000
+            names = sorted(os.path.relpath(path, SRC_DIR) for path in paths)
+            print(f'{", ".join(names)}: regenerated {len(stale)} theme(s), '
+                  f'{len(written)} changed, in {elapsed:.1f} ms')
+            for file_name in written:
+                print(f'  {file_name}')
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass